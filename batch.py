@@ -0,0 +1,165 @@
+"""Vectorised batch self-play for Gomoku, using NumPy
+
+A BatchSimulator plays many games at once.  The boards are one int8 array
+of shape (N, height, width) holding 1 for black, -1 for white and 0 for
+empty.  Each step picks a move for every game at once, then measures the
+chains through the moves just played along the four lines, in all games
+at once.  Finished games are handed back as records and their
+slots start new games.
+
+Wins follow the rules of core.Game: k in a row (exactly k with exact), and
+not with both ends blocked by the opponent.
+
+"""
+
+import numpy as np
+
+from core import Piece, DIRECTIONS
+
+
+class BatchSimulator:
+    """Plays batch_size games of height x width Gomoku side by side, won
+    by chains of k as in core.Game(height, width, radius, k, exact).
+
+    Moves are random: each game shuffles the cells once when it starts and
+    plays them in that order.  With a radius, moves are instead random among
+    the empty cells within radius of a stone (like core.Game's candidate
+    moves), which gives more realistic games.  Records are (moves, winner) pairs where
+    moves is a list of (row, col) and winner is a Piece, or None for a
+    draw."""
+
+    def __init__(self, batch_size=1024, height=15, width=15, radius=None,
+                 k=5, exact=True, seed=None):
+        self.batch_size = batch_size
+        self.height = height
+        self.width = width
+        self.radius = radius
+        self.k = k
+        self.exact = exact
+        self.rng = np.random.default_rng(seed)
+        # reach rows and columns of padding on every side, so the lines
+        # through a move, up to one cell past the end of any chain that can
+        # win, can always be read; padding is empty, which is how core.Game
+        # treats the board edge.  With exact, a chain that runs k cells out
+        # from the move is already too long; without it, a chain can run
+        # to the far edge of the board
+        self.reach = reach = k if exact else max(height, width)
+        self.padded = np.zeros((batch_size, height + 2 * reach,
+                                width + 2 * reach), np.int8)
+        self.boards = self.padded[:, reach:-reach, reach:-reach]
+        # Offsets of the cells of the four lines through a move
+        steps = np.arange(-reach, reach + 1)
+        self.line_rows = np.array([steps * dr for dr, dc in DIRECTIONS])
+        self.line_cols = np.array([steps * dc for dr, dc in DIRECTIONS])
+        self.moves = np.zeros((batch_size, height * width), np.int16)
+        self.orders = np.zeros((batch_size, height * width), np.int16)
+        self.num_moves = np.zeros(batch_size, np.int32)
+        self.active = np.ones(batch_size, bool)
+        self.total_moves = 0
+
+    def reset(self, games):
+        """Clear the boards of the given game slots."""
+        self.padded[games] = 0
+        self.num_moves[games] = 0
+        if self.radius is None:
+            cells = np.arange(self.height * self.width, dtype=np.int16)
+            self.orders[games] = self.rng.permuted(
+                np.broadcast_to(cells, (len(games), len(cells))), axis=1)
+        self.active[games] = True
+
+    def step(self):
+        """Make one move in every active game and return the records of
+        the games that finished."""
+        games = np.flatnonzero(self.active)
+        if not len(games):
+            return []
+        if self.radius is None:
+            cells = self.orders[games, self.num_moves[games]]
+        else:
+            flat = self.boards[games].reshape(len(games), -1)
+            scores = self.rng.random(flat.shape, np.float32)
+            scores += self._near(games).reshape(len(games), -1)
+            scores[flat != 0] = -1.0
+            cells = scores.argmax(axis=1)
+
+        # Black moves on even move numbers
+        colour = np.where(self.num_moves[games] % 2 == 0, 1, -1).astype(np.int8)
+        rows, cols = np.divmod(cells, self.width)
+        self.boards[games, rows, cols] = colour
+        self.moves[games, self.num_moves[games]] = cells
+        self.num_moves[games] += 1
+        self.total_moves += len(games)
+
+        won = self._fives(games, rows, cols, colour)
+        full = self.num_moves[games] == self.height * self.width
+        done = won | full
+        records = []
+        for game, winner in zip(games[done], won[done]):
+            count = self.num_moves[game]
+            rows, cols = np.divmod(self.moves[game, :count], self.width)
+            moves = list(zip(rows.tolist(), cols.tolist()))
+            records.append((moves, Piece.BLACK if winner and count % 2 else
+                            Piece.WHITE if winner else None))
+        self.active[games[done]] = False
+        return records
+
+    def run(self, num_games):
+        """Play num_games games and yield their records as they finish."""
+        started = min(num_games, self.batch_size)
+        self.active[:] = False
+        self.reset(np.arange(started))
+        finished = 0
+        while finished < num_games:
+            records = self.step()
+            for record in records:
+                yield record
+            finished += len(records)
+            # Start new games in the slots that just finished
+            free = np.flatnonzero(~self.active)
+            free = free[:num_games - started]
+            if len(free):
+                self.reset(free)
+                started += len(free)
+
+    def _near(self, games):
+        """Return a (len(games), height, width) mask of the cells within
+        radius of some stone."""
+        stones = self.boards[games] != 0
+        near = stones
+        for step in range(1, self.radius + 1):
+            grown = near.copy()
+            grown[:, step:, :] |= near[:, :-step, :]
+            grown[:, :-step, :] |= near[:, step:, :]
+            near = grown
+        for step in range(1, self.radius + 1):
+            grown = near.copy()
+            grown[:, :, step:] |= near[:, :, :-step]
+            grown[:, :, :-step] |= near[:, :, step:]
+            near = grown
+        return near
+
+    def _fives(self, games, rows, cols, colour):
+        """Return, for each of games, whether the move just played on
+        (rows, cols) by colour (1 or -1 per game) makes a winning chain."""
+        reach = self.reach
+        # lines[game, direction, i] is the cell i - reach steps from the
+        # move in that direction
+        lines = self.padded[games[:, None, None],
+                            rows[:, None, None] + reach + self.line_rows,
+                            cols[:, None, None] + reach + self.line_cols]
+        colour = colour[:, None, None]
+        ends = []
+        length = 1
+        for side in (lines[:, :, reach - 1::-1], lines[:, :, reach + 1:]):
+            # The number of the mover's stones running out from the move
+            # on this side, and the cell just past them
+            run = np.cumprod(side == colour, axis=2).sum(axis=2)
+            length = length + run
+            ends.append(np.take_along_axis(
+                side, np.minimum(run, reach - 1)[:, :, None], axis=2))
+        if self.exact:
+            chain = length == self.k
+        else:
+            chain = length >= self.k
+        blocked = (ends[0] == -colour) & (ends[1] == -colour)
+        return (chain & ~blocked[:, :, 0]).any(axis=1)
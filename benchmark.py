@@ -0,0 +1,254 @@
+"""Benchmarks for the Gomoku and Othello move generators and searches
+
+Three kinds of measurement are taken on fixed positions:
+
+    perft    the number of leaf nodes of the full move tree to a depth,
+             which must match the baseline exactly, and how long it took
+    search   time for a fixed-depth search (search.Engine for Gomoku,
+             othello.alphabeta_search for Othello)
+    parallel time for parallel.ParallelEngine to reach a fixed depth with
+             1, 2, 4, ... processes, up to the number of CPUs
+    micro    make_move/undo_move and legal_moves loops
+
+Results are written as JSON.  Given a baseline file, every timing is
+compared with it and the run fails if one is slower than the baseline by
+more than the tolerance, or if a perft count differs.
+
+    python benchmark.py --output results.json
+    python benchmark.py --baseline benchmark_baseline.json --tolerance 0.1
+    python benchmark.py --save benchmark_baseline.json
+
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+from random import Random
+from time import perf_counter
+
+from core import Game, BitboardGame
+
+# Fixed positions are reached by seeded random play, so they are the same
+# on every run
+GOMOKU_POSITIONS = [('gomoku-opening', 15, 15, 4),
+                    ('gomoku-middle', 15, 15, 16)]
+OTHELLO_POSITIONS = [('othello-initial', 0), ('othello-middle', 20)]
+
+
+def gomoku_position(height, width, plies, game_class=Game):
+    """Return a game after plies random moves, avoiding finished games."""
+    rng = Random(plies)
+    game = game_class(height, width, radius=2)
+    while game.num_moves < plies:
+        move = rng.choice(sorted(game.legal_moves()))
+        game.make_move(move)
+        if game.terminal_test():
+            game.undo_move()
+    return game
+
+
+def othello_position(plies):
+    from othello import BoardState
+    rng = Random(plies)
+    state = BoardState()
+    for ply in range(plies):
+        state = state.make_move(rng.choice(state.legal_moves()))
+    return state
+
+
+def gomoku_perft(game, depth):
+    """Return the number of leaf nodes depth moves below game."""
+    if depth == 0 or game.terminal_test():
+        return 1
+    nodes = 0
+    for move in game.legal_moves():
+        game.make_move(move)
+        nodes += gomoku_perft(game, depth - 1)
+        game.undo_move()
+    return nodes
+
+
+def othello_perft(state, depth, passed=False):
+    """Return the number of leaf nodes depth moves below state.  A pass is
+    a move; the game ends after two passes in a row."""
+    if depth == 0:
+        return 1
+    nodes = 0
+    for move in state.legal_moves():
+        if move is None and passed:
+            return 1
+        nodes += othello_perft(state.make_move(move), depth - 1, move is None)
+    return nodes
+
+
+def timed(function, repeat):
+    """Return (result, best time in seconds) of repeat calls of function."""
+    best = None
+    for run in range(repeat):
+        start = perf_counter()
+        result = function()
+        elapsed = perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return result, best
+
+
+def gomoku_make_undo(game, iterations):
+    moves = game.legal_moves()
+    for i in range(iterations):
+        for move in moves:
+            game.make_move(move)
+            game.undo_move()
+    return iterations * len(moves)
+
+
+def gomoku_legal_moves(game, iterations):
+    for i in range(iterations):
+        game.legal_moves()
+    return iterations
+
+
+def othello_make_move(state, iterations):
+    moves = state.legal_moves()
+    for i in range(iterations):
+        for move in moves:
+            state.make_move(move)
+    return iterations * len(moves)
+
+
+def othello_legal_moves(state, iterations):
+    for i in range(iterations):
+        state.calculate_legal_moves()
+    return iterations
+
+
+def run(repeat=3, quick=False):
+    """Run every benchmark and return the results as a dict of name:
+    {'seconds': ..., 'nodes': ...}."""
+    from othello import (Othello, SearchStats, alphabeta_search,
+                         othello_player)
+    from parallel import ParallelEngine
+    from search import Engine
+
+    results = {}
+
+    def record(name, function):
+        nodes, seconds = timed(function, repeat)
+        results[name] = {'nodes': nodes, 'seconds': seconds,
+                         'nodes_per_second': nodes / seconds if seconds else 0.0}
+
+    scale = 1 if quick else 4
+    for name, height, width, plies in GOMOKU_POSITIONS:
+        for game_class in (Game, BitboardGame):
+            label = '%s/%s' % (name, game_class.__name__)
+            game = gomoku_position(height, width, plies, game_class)
+            record('perft/%s/2' % label, lambda: gomoku_perft(game, 2))
+            record('micro/make_undo/' + label,
+                   lambda: gomoku_make_undo(game, 5 * scale))
+            record('micro/legal_moves/' + label,
+                   lambda: gomoku_legal_moves(game, 500 * scale))
+        game = gomoku_position(height, width, plies)
+        depth = 2 if quick else 3
+
+        def gomoku_search():
+            engine = Engine(game)
+            engine.search(time_limit=float('inf'), max_depth=depth)
+            engine.close()
+            return engine.nodes
+        record('search/%s/depth%d' % (name, depth), gomoku_search)
+
+        processes = 1
+        while processes <= (os.cpu_count() or 1):
+            def parallel_search(processes=processes):
+                engine = ParallelEngine(game, processes)
+                engine.search(time_limit=float('inf'), max_depth=depth + 1)
+                engine.close()
+                return engine.nodes
+            record('parallel/%s/depth%d/%dprocs' % (name, depth + 1,
+                                                     processes),
+                   parallel_search)
+            processes *= 2
+
+    game = Othello()
+    game.current_player = othello_player('benchmark')
+    for name, plies in OTHELLO_POSITIONS:
+        state = othello_position(plies)
+        depth = 1 if quick else 2
+        record('perft/%s/%d' % (name, depth),
+               lambda: othello_perft(state, depth))
+        record('micro/make_move/' + name,
+               lambda: othello_make_move(state, 10 * scale))
+        record('micro/legal_moves/' + name,
+               lambda: othello_legal_moves(state, 10 * scale))
+
+        def othello_search():
+            stats = SearchStats()
+            alphabeta_search(state, game, depth, stats=stats)
+            return stats.nodes
+        record('search/%s/depth%d' % (name, depth), othello_search)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of messages, one per regression against baseline."""
+    failures = []
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            continue
+        old = baseline[name]
+        if name.startswith('perft/') and result['nodes'] != old['nodes']:
+            failures.append('%s: %d nodes, baseline %d' %
+                            (name, result['nodes'], old['nodes']))
+        if result['seconds'] > old['seconds'] * (1 + tolerance):
+            failures.append('%s: %.4fs, baseline %.4fs (%+.0f%%)' %
+                            (name, result['seconds'], old['seconds'],
+                             100 * (result['seconds'] / old['seconds'] - 1)))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', help='write the results to this file')
+    parser.add_argument('--baseline', help='compare against this file')
+    parser.add_argument('--save', help='write the results as a new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='allowed slowdown as a fraction (default 0.10)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs per benchmark; the fastest is kept')
+    parser.add_argument('--quick', action='store_true',
+                        help='smaller depths and loops')
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.quick)
+    document = {'python': platform.python_version(),
+                'machine': platform.machine(),
+                'quick': args.quick,
+                'results': results}
+    for name, result in sorted(results.items()):
+        print('%-50s %10d nodes %9.4fs %12.0f/s' %
+              (name, result['nodes'], result['seconds'],
+               result['nodes_per_second']))
+    for path in (args.output, args.save):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(document, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        if not os.path.exists(args.baseline):
+            sys.exit('no baseline %s' % args.baseline)
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('quick') != args.quick:
+            sys.exit('baseline was run with quick=%s' % baseline.get('quick'))
+        failures = compare(results, baseline['results'], args.tolerance)
+        for failure in failures:
+            print('REGRESSION', failure)
+        if failures:
+            sys.exit(1)
+        print('No regressions against %s' % args.baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,11 @@
 
 from tkinter import *
 from core import Game as Game
-from core import Player as Player
-from time import sleep
+from core import Piece
+from search import Engine
+from worker import SearchWorker
+
+
 class GUI:
     elementSize = 50
     gridBorder = 3
@@ -11,6 +14,9 @@ class GUI:
     p2Color = "#FF1A00"
     backgroundColor = "#FFFFFF"
     gameOn = False
+    thinkTime = 2.0
+    pollDelay = 100
+    worker = None
     
     def __init__(self, master):
         self.master = master
@@ -33,30 +39,39 @@ class GUI:
         self.canvas.bind('<Button-1>', self._canvasClick)
         self.newGame()
 
-    def draw(self):       
-        for c in range(self.game.size):
-            for r in range(self.game.size):
-                if r >= len(self.game.cells): continue
-                
+    def draw(self):
+        """Create one hidden stone item per cell.  Moves only recolour and
+        show the item of their cell (see drawMove), so the canvas holds the
+        same items for the whole game."""
+        self.stones = []
+        for r in range(self.game.height):
+            row = []
+            for c in range(self.game.width):
                 x0 = c*self.elementSize
                 y0 = r*self.elementSize
                 x1 = (c+1)*self.elementSize
                 y1 = (r+1)*self.elementSize
-                fill = self.p1Color if self.game.cells[c][r] == self.game.players[True] else self.p2Color
-                self.canvas.create_oval(x0 + 2,
-                                        self.canvas.winfo_height() - (y0 + 2),
-                                        x1 - 2,
-                                        self.canvas.winfo_height() - (y1 - 2),
-                                        fill = fill, outline=self.gridColor)
+                row.append(self.canvas.create_oval(x0 + 2, y0 + 2,
+                                                   x1 - 2, y1 - 2,
+                                                   outline=self.gridColor,
+                                                   state=HIDDEN))
+            self.stones.append(row)
+
+    def drawMove(self, move):
+        """Show the stone just played on move."""
+        (r, c) = move
+        piece = self.game.cells[r][c]
+        fill = self.p1Color if piece == Piece.BLACK else self.p2Color
+        self.canvas.itemconfigure(self.stones[r][c], fill=fill, state=NORMAL)
 
     def drawGrid(self):
         x0, x1 = 0, self.canvas.winfo_width()
-        for r in range(1, self.game.size):
+        for r in range(1, self.game.height):
             y = r*self.elementSize
             self.canvas.create_line(x0, y, x1, y, fill=self.gridColor)
 
         y0, y1 = 0, self.canvas.winfo_height()
-        for c in range(1, self.game.size):
+        for c in range(1, self.game.width):
             x = c*self.elementSize
             self.canvas.create_line(x, y0, x, y1, fill=self.gridColor)
 
@@ -72,70 +87,96 @@ class GUI:
         columns = 15
         rows = 15
         
-        self.game = Game(columns, rows)
+        # Abandon the engine's search of the old game, if any
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker = None
+
+        self.game = Game(rows, columns, radius=2)
+        self.gameOn = False
 
         self.canvas.delete(ALL)
-        self.canvas.config(width=(self.elementSize)*self.game.size,
-                           height=(self.elementSize)*self.game.size)
+        self.canvas.config(width=(self.elementSize)*self.game.width,
+                           height=(self.elementSize)*self.game.height)
         self.master.update() # Rerender window
         self.drawGrid()
         self.draw()
-        players = (Player(),Player())
-        '''
-        while True:
-            for player in players:
-                move = player.random_search(self.game)
-                self.game.make_move(move)
-                self.game.display()
-                self.drawGrid()
-                self.draw()
-                self._updateCurrentPlayer()
-                if self.game.terminal_test():
-                    return
-        return
-        '''
 
+        # Building the engine (its evaluator's tables) takes a moment, so
+        # it too happens in a worker; clicks are ignored until it is ready
+        self.engine = None
+        self.currentPlayerVar.set('Preparing %s...' % self.p2)
+        self.worker = SearchWorker()
+        self.worker.start(Engine, self.game)
+        self.master.after(self.pollDelay, self._pollEngineReady, self.worker)
+
+    def _pollEngineReady(self, worker):
+        if worker is not self.worker: return
+        if not worker.done():
+            self.master.after(self.pollDelay, self._pollEngineReady, worker)
+            return
+        self.worker = None
+        if worker.error is not None:
+            raise worker.error
+        self.engine = worker.result
         self._updateCurrentPlayer()
-
         self.gameOn = True
 
     def _updateCurrentPlayer(self):
-        p = self.p1 if self.game.first_player else self.p2
+        p = self.p1 if self.game.to_move() == Piece.BLACK else self.p2
         self.currentPlayerVar.set('Current player: ' + p)
 
     def _canvasClick(self, event):
         if not self.gameOn: return
-        if self.game.game_over: return
-        
+        if self.worker is not None: return
+
         c = event.x // self.elementSize
         r = event.y // self.elementSize
-        
-        move = player._search(game)
-        #print("hey")
+        if not self.game.is_legal_position(r, c): return
+        if self.game.cells[r][c] != Piece.EMPTY: return
+
+        # The player clicks for blue and the engine answers for red.  It
+        # thinks in a worker thread, polled from the Tk event loop.
+        self._play((r, c))
+        if self.gameOn:
+            self.worker = SearchWorker()
+            self.engine.stop = self.worker.stop
+            self.worker.start(self.engine.search, self.thinkTime)
+            self.master.after(self.pollDelay, self._pollEngine, self.worker)
+
+    def _pollEngine(self, worker):
+        if worker is not self.worker: return
+        if not worker.done():
+            self.currentPlayerVar.set('%s is thinking: depth %d, %d nodes' %
+                                      (self.p2, self.engine.depth,
+                                       self.engine.nodes))
+            self.master.after(self.pollDelay, self._pollEngine, worker)
+            return
+        self.worker = None
+        if worker.error is not None:
+            raise worker.error
+        self._play(worker.result)
+
+    def _play(self, move):
         self.game.make_move(move)
-        self.draw()
+        self.drawMove(move)
         self._updateCurrentPlayer()
-        sleep(1)
-        #if (0 <= c < self.game.size['c']):
-            
-         #   self.make_move(c)
-          #  self.draw()
-           # self._updateCurrentPlayer()
-
-        if self.game.game_over:
+        if self.game.terminal_test():
+            self.gameOn = False
             x = self.canvas.winfo_width() // 2
             y = self.canvas.winfo_height() // 2
-            if self.game.game_over == 'draw':
+            if not self.game.has_won():
                 t = 'DRAW!'
             else:
-                winner = self.p1 if self.game.first_player else self.p2
+                winner = self.p1 if self.game.to_move() == Piece.WHITE else self.p2
                 t = winner + ' won!'
             self.canvas.create_text(x, y, text=t, font=("Helvetica", 32), fill="#333")
 
     def _newGameButton(self):
         self.newGame()
 
-root = Tk()
-app = GUI(root)
+if __name__ == '__main__':
+    root = Tk()
+    app = GUI(root)
 
-root.mainloop()
+    root.mainloop()
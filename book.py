@@ -0,0 +1,149 @@
+"""Gomoku opening book, built from self-play or move-sequence files
+
+The book keeps, for each position of the first max_ply moves, how often each
+move was played and how it scored for the player who played it.  Positions
+that are rotations or reflections of each other are folded together: a
+position is stored under the smallest of the Zobrist hashes of its
+symmetric images (see symmetry), with its moves mapped into that image.
+probe() looks the current game up and maps the chosen move back to the
+real board.
+
+"""
+
+import struct
+from multiprocessing import Pool
+
+from core import Piece, Player, zobrist_keys
+from records import BLACK_WON, WHITE_WON, DRAW, gomoku_record
+from symmetry import inverses, symmetric_hashes, transforms
+
+ENTRY = struct.Struct('<QHIII')
+HEADER = struct.Struct('<8sBBH')
+MAGIC = b'GMKBOOK1'
+
+
+class OpeningBook:
+    """Move statistics for the opening positions of height x width games.
+
+    entries maps a canonical position hash to {canonical move: [played,
+    wins, draws]}, counted for the player making the move."""
+
+    def __init__(self, height=15, width=15, max_ply=12):
+        self.height = height
+        self.width = width
+        self.max_ply = max_ply
+        self.entries = {}
+
+    def add_game(self, moves, result):
+        """Add a game given as (row, col) moves and a records result."""
+        width = self.width
+        tables = transforms(self.height, width)
+        keys = zobrist_keys(self.height, width)
+        hashes = [0] * len(tables)
+        for number, (row, col) in enumerate(moves[:self.max_ply]):
+            cell = row * width + col
+            key = min(hashes)
+            # A symmetric position has several canonical images; use the
+            # one that gives the move the lowest number
+            move = min(tables[t][cell] for t in range(len(tables))
+                       if hashes[t] == key)
+            stats = self.entries.setdefault(key, {}).setdefault(
+                move, [0, 0, 0])
+            stats[0] += 1
+            if result == DRAW:
+                stats[2] += 1
+            elif result == (BLACK_WON, WHITE_WON)[number % 2]:
+                stats[1] += 1
+            colour_keys = keys[number % 2]
+            for t, table in enumerate(tables):
+                hashes[t] ^= colour_keys[table[cell]]
+
+    def add_records(self, records):
+        """Add every records.Record of a GameDatabase or move file."""
+        for record in records:
+            if (record.height, record.width) == (self.height, self.width):
+                self.add_game(record.coordinates(), record.result)
+
+    def add_move_file(self, path):
+        """Add the games of a move-sequence file (see position_index)."""
+        from position_index import read_move_file
+        self.add_records(read_move_file(path, height=self.height,
+                                        width=self.width))
+
+    def self_play(self, games, black=None, white=None, radius=2,
+                  processes=None):
+        """Play that many headless games between black and white (random
+        players by default) and add them to the book."""
+        black = black or Player()
+        white = white or Player()
+        tasks = [(black, white, self.height, self.width, radius)] * games
+        with Pool(processes) as pool:
+            for moves, result in pool.imap_unordered(_self_play_game, tasks):
+                self.add_game(moves, result)
+
+    def probe(self, game, min_played=2):
+        """Return the book move for game, a core.Game, or None if the
+        position is not in the book or its moves are played too rarely.
+        Games of another board size are never in the book."""
+        if (game.height, game.width) != (self.height, self.width):
+            return None
+        if game.num_moves >= self.max_ply:
+            return None
+        width = self.width
+        moves = [row * width + col for (row, col), *rest in game.history]
+        hashes = symmetric_hashes(self.height, width, moves)
+        key = min(hashes)
+        moves = self.entries.get(key)
+        if not moves:
+            return None
+        best = None
+        for move, (played, wins, draws) in moves.items():
+            if played < min_played:
+                continue
+            score = ((wins + 0.5 * draws) / played, played)
+            if best is None or score > best[0]:
+                best = (score, move)
+        if best is None:
+            return None
+        # Map the canonical move back through the inverse transform
+        table = inverses(self.height, width)[hashes.index(key)]
+        (row, col) = divmod(table[best[1]], width)
+        # A hash collision could name an occupied cell
+        if game.cells[row][col] != Piece.EMPTY:
+            return None
+        return (row, col)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, self.height, self.width, self.max_ply))
+            for key in sorted(self.entries):
+                for move, (played, wins, draws) in sorted(
+                        self.entries[key].items()):
+                    f.write(ENTRY.pack(key, move, played, wins, draws))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, height, width, max_ply = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("%s is not an opening book" % path)
+        book = cls(height, width, max_ply)
+        for key, move, played, wins, draws in ENTRY.iter_unpack(
+                data[HEADER.size:]):
+            book.entries.setdefault(key, {})[move] = [played, wins, draws]
+        return book
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __repr__(self):
+        return '<%s %d positions>' % (self.__class__.__name__,
+                                      len(self.entries))
+
+
+def _self_play_game(args):
+    """Pool worker: play one game and return its moves and result."""
+    from tournament import play_game
+    record = gomoku_record(play_game(*args))
+    return record.coordinates(), record.result
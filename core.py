@@ -1,5 +1,5 @@
 from enum import Enum
-from random import randint
+from random import randint, Random
 from time import sleep
 
 
@@ -11,27 +11,82 @@ class Piece(Enum):
 
 
 class Player:
+    """Chooses moves for one side.  strategy names the search method used
+    by search(): 'random', 'alphabeta', 'parallel' or 'mcts'.  time_limit
+    is the number of seconds the engines may think about each move,
+    exploration is the UCT exploration constant of the 'mcts' strategy and
+    processes the number of processes of the 'parallel' strategy (one per
+    CPU by default).  If book, a book.OpeningBook, has a move for the
+    position it is played without searching.
+
+    The 'alphabeta' strategy (search.Engine) looks about 5 plies ahead on
+    a 15x15 board with the default time_limit of one second, and 3 or 4
+    with a tenth of a second."""
+
+    def __init__(self, strategy='random', time_limit=1.0, exploration=1.4,
+                 book=None, processes=None):
+        self.strategy = strategy
+        self.time_limit = time_limit
+        self.exploration = exploration
+        self.book = book
+        self.processes = processes
+        self.engine = None
+        self.mcts = None
+
+    def search(self, game):
+        """Return the move chosen by this player's strategy."""
+        if self.book is not None:
+            move = self.book.probe(game)
+            if move is not None:
+                return move
+        return getattr(self, self.strategy + '_search')(game)
+
     def random_search(self, game):
         moves = game.legal_moves()
         return moves[randint(0, len(moves)-1)]
 
-    # def alphabeta_full_search(self, game):
-
-
-
-def play_gomoku(player0, player1):
+    def alphabeta_search(self, game):
+        # Keep the engine, and so its tables, for the rest of the game
+        if self.engine is None or self.engine.game is not game:
+            from search import Engine
+            if self.engine is not None:
+                self.engine.close()
+            self.engine = Engine(game)
+        return self.engine.search(self.time_limit)
+
+    def parallel_search(self, game):
+        if self.engine is None or self.engine.game is not game:
+            from parallel import ParallelEngine
+            if self.engine is not None:
+                self.engine.close()
+            self.engine = ParallelEngine(game, self.processes)
+        return self.engine.search(self.time_limit)
+
+    def mcts_search(self, game):
+        # The tree below the move played is reused by the next search
+        if self.mcts is None:
+            from mcts import MCTS
+            self.mcts = MCTS(self.exploration)
+        return self.mcts.search(game, self.time_limit)
+
+
+
+def play_gomoku(player0, player1, database=None):
     # Set-up logic
     players = (player0, player1)
-    game = Game(5, 5)
+    game = Game(5, 5, radius=2)
 
     while True:
         for player in players:
-            move = player.random_search(game)
+            move = player.search(game)
             game.make_move(move)
             game.display()
 
             if game.terminal_test():
                 print("Game over")
+                if database is not None:
+                    from records import gomoku_record
+                    database.append(gomoku_record(game))
                 return
 
             sleep(1)
@@ -44,21 +99,62 @@ class Game:
     legal_moves, make_move, utility, and terminal_test. You may
     override display and successors or you can inherit their default
     methods. You will also need to set the .initial attribute to the
-    initial state; this can be done in the constructor."""
+    initial state; this can be done in the constructor.
+
+    If radius is given, legal_moves only returns the empty cells within
+    radius (in both row and column) of some stone.  That candidate set is
+    kept up to date by make_move and undo_move instead of being rescanned.
+
+    Objects in listeners are told about every stone placed or taken back,
+    through their moved(row, col, piece) and unmoved(row, col, piece)
+    methods, so they can keep incremental data in step with the board.
+
+    A chain of k stones wins, unless the opponent blocks both of its ends
+    (the board edge does not block).  If exact is False, longer chains
+    (overlines) win as well; by default they do not.  has_won only looks
+    at the lines through the last move.
+
+    Every run of k cells in a line is a window, and window_counts[colour]
+    holds the number of stones of each colour in each window, kept up to
+    date by make_move and undo_move.  A move can only win if it fills a
+    window, which has_won checks first.  live_windows counts the windows
+    that still lack a stone of one of the colours; once it reaches 0
+    neither player can win and terminal_test calls the game a draw."""
 
-    def __init__(self, height, width):
+    def __init__(self, height, width, radius=None, k=5, exact=True):
         self.players = {True : 'X', False : 'O'}
-        self.first_player = True 
-        self.size = 15 
+        self.first_player = True
+        self.size = max(height, width)
         self.height = height
         self.width = width
+        self.k = k
+        self.exact = exact
+        self.lines = line_table(height, width)
         self.cells = [[Piece.EMPTY for column in range(width)]
                       for row in range(height)]
         self.num_moves = 0
         self.last_move = (-1, -1)
+        self.radius = radius
+        self.candidates = set()
+        self.neighbours = (neighbourhood_table(height, width, radius)
+                           if radius is not None else None)
+        self.history = []
+        self.zobrist = zobrist_keys(height, width)
+        self.hash = 0
+        self.listeners = []
+        self._init_windows()
+
+    def _init_windows(self):
+        self.windows, self.cell_windows = window_table(self.height,
+                                                       self.width, self.k)
+        self.window_counts = ([0] * len(self.windows),
+                              [0] * len(self.windows))
+        self.live_windows = len(self.windows)
 
     def legal_moves(self):
         """Return a list of the allowable moves at this point."""
+        if self.candidates:
+            return list(self.candidates)
         moves = []
         for row in range(self.height):
             for col in range(self.width):
@@ -69,9 +165,78 @@ class Game:
     def make_move(self, move):
         """Return the state that results from making a move from a state."""
         (row, col) = move
-        self.cells[row][col] = self.to_move()
+        piece = self.to_move()
+        self.cells[row][col] = piece
+        self.hash ^= self.zobrist[piece.value][row * self.width + col]
+        self._count_windows(row * self.width + col, piece.value)
         self.num_moves += 1
+        self.history.append((move, self.last_move, self._add_candidates(move)))
         self.last_move = move
+        for listener in self.listeners:
+            listener.moved(row, col, piece)
+
+    def undo_move(self):
+        """Take back the last move made, restoring the previous state."""
+        move, self.last_move, (was_candidate, added) = self.history.pop()
+        (row, col) = move
+        piece = self.cells[row][col]
+        self.cells[row][col] = Piece.EMPTY
+        self.hash ^= self.zobrist[piece.value][row * self.width + col]
+        self._uncount_windows(row * self.width + col, piece.value)
+        self.num_moves -= 1
+        self.candidates.difference_update(added)
+        if was_candidate:
+            self.candidates.add(move)
+        for listener in self.listeners:
+            listener.unmoved(row, col, piece)
+        return move
+
+    def _add_candidates(self, move):
+        """Update the candidate set for a stone placed on move.  Returns
+        whether move was a candidate and the cells that were added, which is
+        what undo_move needs to put the set back."""
+        if self.neighbours is None:
+            return False, ()
+        candidates = self.candidates
+        cells = self.cells
+        was_candidate = move in candidates
+        candidates.discard(move)
+        added = [cell for cell in self.neighbours[move]
+                 if cell not in candidates and
+                 cells[cell[0]][cell[1]] == Piece.EMPTY]
+        candidates.update(added)
+        return was_candidate, added
+
+    def _count_windows(self, index, colour):
+        """Add a stone of colour on cell index to the window counts."""
+        own = self.window_counts[colour]
+        other = self.window_counts[1 - colour]
+        for window in self.cell_windows[index]:
+            if not own[window] and other[window]:
+                self.live_windows -= 1
+            own[window] += 1
+
+    def _uncount_windows(self, index, colour):
+        """Take a stone of colour on cell index out of the window counts."""
+        own = self.window_counts[colour]
+        other = self.window_counts[1 - colour]
+        for window in self.cell_windows[index]:
+            own[window] -= 1
+            if not own[window] and other[window]:
+                self.live_windows += 1
+
+    def _fills_window(self, index, colour, stones):
+        """Return True if some window through cell index holds stones
+        stones of colour."""
+        counts = self.window_counts[colour]
+        for window in self.cell_windows[index]:
+            if counts[window] == stones:
+                return True
+        return False
+
+    def is_dead_draw(self):
+        """Return True if neither player can complete a window any more."""
+        return self.live_windows == 0
 
     # def utility(self, state, player):
     #     "Return the value of this final state to player."
@@ -80,48 +245,63 @@ class Game:
     def terminal_test(self):
         if self.num_moves == self.height * self.width:
             return True
+        return self.has_won() or self.live_windows == 0
 
-        directions = [[1, 0], [0, 1], [1, 1], [1, -1]]
+    def has_won(self):
+        """Return True if the last move made completed a winning chain."""
+        if self.num_moves == 0:
+            return False
         (row, col) = self.last_move
-        for direction in directions:
-            if self._check_direction(row, col, direction):
-                return True
-        return False
-
-    def _check_direction(self, row, column, direction):
-        [dr, dc] = direction
-        piece = self.cells[row][column]
-
-        # Obtain the maximum chain containing this piece by searching for the
-        # position with the maximum/minimum row and column values that has
-        # a different piece type than the one being assigned
-        min_row, min_column = row - dr, column - dc
-        while (self.is_legal_position(min_row, min_column) and
-               self.cells[min_row][min_column] == piece):
-            min_row -= dr
-            min_column -= dc
-        max_row, max_column = row + dr, column + dc
-        while (self.is_legal_position(max_row, max_column) and
-               self.cells[max_row][max_column] == piece):
-            max_row += dr
-            max_column += dc
-
-        # Get the length of the resulting streak. The chain length is equal to
-        # the difference in row values or in column values.
-        length = (abs(max_row - min_row) - 1 if dr != 0
-                  else abs(max_column - min_column) - 1)
-
-        if length != 5:
+        if not self._fills_window(row * self.width + col,
+                                  (self.num_moves - 1) & 1, self.k):
             return False
+        return self._check_lines(row, col)
 
-        # Winning chain can border the board boundary
-        if (not self.is_legal_position(min_row, min_column) or
-                not self.is_legal_position(max_row, max_column)):
-            return True
-
-        # Winning chain must not be surrounded by two pieces of opposite type
-        return (self.cells[min_row][min_column] == Piece.EMPTY or
-                self.cells[max_row][max_column] == Piece.EMPTY)
+    def is_winning_move(self, move, piece=None):
+        """Return True if putting piece (by default the player to move) on
+        the empty square move would complete a winning chain."""
+        (row, col) = move
+        piece = piece or self.to_move()
+        if not self._fills_window(row * self.width + col, piece.value,
+                                  self.k - 1):
+            return False
+        self.cells[row][col] = piece
+        try:
+            return self._check_lines(row, col)
+        finally:
+            self.cells[row][col] = Piece.EMPTY
+
+    def _check_lines(self, row, column):
+        """Return True if the stone on (row, column) is part of a winning
+        chain."""
+        cells = self.cells
+        piece = cells[row][column]
+        k = self.k
+        for backward, forward in self.lines[row * self.width + column]:
+            # Walk out from the stone in both senses to the ends of the
+            # chain, noting what lies just past each end (None for the
+            # board edge)
+            length = 1
+            before = after = None
+            for r, c in backward:
+                if cells[r][c] != piece:
+                    before = cells[r][c]
+                    break
+                length += 1
+            for r, c in forward:
+                if cells[r][c] != piece:
+                    after = cells[r][c]
+                    break
+                length += 1
+
+            if length < k or (self.exact and length != k):
+                continue
+
+            # Winning chain must not be surrounded by two pieces of
+            # opposite type
+            if before != after or before != PIECES[1 - piece.value]:
+                return True
+        return False
 
     def to_move(self):
         """Return the player whose move it is in this state."""
@@ -136,15 +316,18 @@ class Game:
             print('\n')
         print('\n')
 
-    def successors(self, state):
-        """Return a list of legal (move, state) pairs."""
-        m = [(move, self.make_move(move, state))
-             for move in self.legal_moves(state)]
-        # print "succ len: ", len(m)
-        return m
+    def successors(self):
+        """Lazily generate a (move, game) pair for each legal move.
 
-    #        return [(move, self.make_move(move, state))
-    #                for move in self.legal_moves(state)]
+        The move is played on this game before the pair is yielded and taken
+        back when the generator resumes (or is closed), so a search walks one
+        board instead of copying it.  Don't keep the yielded game around."""
+        for move in self.legal_moves():
+            self.make_move(move)
+            try:
+                yield move, self
+            finally:
+                self.undo_move()
 
     def is_legal_position(self, row, column):
         """Checks if a specified position is legal"""
@@ -154,4 +337,274 @@ class Game:
         return '<%s>' % self.__class__.__name__
 
 
+
+# The stones in move order: black moves first
+PIECES = (Piece.BLACK, Piece.WHITE)
+
+# Directions used for win detection, as (row step, column step).
+DIRECTIONS = ((1, 0), (0, 1), (1, 1), (1, -1))
+
+# Lookup tables, built once per board size and shared by every game of that
+# size.
+_line_tables = {}
+_window_tables = {}
+_bitboard_tables = {}
+_neighbourhood_tables = {}
+_zobrist_tables = {}
+
+
+def zobrist_keys(height, width):
+    """Return the Zobrist keys for a height x width board.
+
+    keys[piece.value][row * width + col] is the 64-bit key of that piece on
+    that cell, and a position's hash is the xor of the keys of its stones.
+    The generator is seeded so hashes are the same in every process."""
+    key = (height, width)
+    if key not in _zobrist_tables:
+        rng = Random(height * 1000 + width)
+        _zobrist_tables[key] = tuple(
+            tuple(rng.getrandbits(64) for cell in range(height * width))
+            for piece in (Piece.BLACK, Piece.WHITE))
+    return _zobrist_tables[key]
+
+
+def line_table(height, width):
+    """Return the line table of a height x width board.
+
+    table[row * width + col] holds one (backward, forward) pair per
+    direction of DIRECTIONS: the cells met stepping from (row, col) against
+    and along the direction, nearest first, up to the board edge."""
+    key = (height, width)
+    if key not in _line_tables:
+        table = []
+        for row in range(height):
+            for col in range(width):
+                pairs = []
+                for dr, dc in DIRECTIONS:
+                    pair = []
+                    for step in (-1, 1):
+                        cells = []
+                        r, c = row + step * dr, col + step * dc
+                        while 0 <= r < height and 0 <= c < width:
+                            cells.append((r, c))
+                            r, c = r + step * dr, c + step * dc
+                        pair.append(tuple(cells))
+                    pairs.append(tuple(pair))
+                table.append(tuple(pairs))
+        _line_tables[key] = table
+    return _line_tables[key]
+
+
+def window_table(height, width, k):
+    """Return (windows, cell_windows) for a height x width board.
+
+    windows lists every run of k cells in a row, column or diagonal as a
+    tuple of (row, col) cells, and cell_windows[row * width + col] holds the
+    numbers of the windows that contain that cell."""
+    key = (height, width, k)
+    if key not in _window_tables:
+        windows = []
+        cell_windows = [[] for cell in range(height * width)]
+        for dr, dc in DIRECTIONS:
+            for row in range(height):
+                for col in range(width):
+                    end_row = row + dr * (k - 1)
+                    end_col = col + dc * (k - 1)
+                    if not (0 <= end_row < height and 0 <= end_col < width):
+                        continue
+                    window = tuple((row + dr * i, col + dc * i)
+                                   for i in range(k))
+                    for r, c in window:
+                        cell_windows[r * width + c].append(len(windows))
+                    windows.append(window)
+        _window_tables[key] = (windows,
+                               [tuple(numbers) for numbers in cell_windows])
+    return _window_tables[key]
+
+
+def bitboard_tables(height, width):
+    """Return the (coords, shifts) tables for a height x width bitboard.
+
+    Cell (row, col) is bit row * width + col.  coords maps a bit index back to
+    its (row, col) move.  shifts holds one (shift, forward mask, backward mask)
+    triple per direction: (x & forward) << shift moves every bit of x one step
+    along the direction, and (x & backward) >> shift moves it one step back,
+    dropping the bits that would leave the board or wrap onto another row."""
+    key = (height, width)
+    if key not in _bitboard_tables:
+        coords = [(row, col) for row in range(height) for col in range(width)]
+        shifts = []
+        for dr, dc in DIRECTIONS:
+            forward = backward = 0
+            for index, (row, col) in enumerate(coords):
+                if 0 <= row + dr < height and 0 <= col + dc < width:
+                    forward |= 1 << index
+                if 0 <= row - dr < height and 0 <= col - dc < width:
+                    backward |= 1 << index
+            shifts.append((dr * width + dc, forward, backward))
+        _bitboard_tables[key] = (coords, tuple(shifts))
+    return _bitboard_tables[key]
+
+
+def chain_wins(shifts, bit, own, other, k=5, exact=True):
+    """Return True if the stone bit of own is part of a winning chain, on a
+    bitboard with the given bitboard_tables shifts.  k and exact are the
+    rules of Game."""
+    for shift, forward, backward in shifts:
+        # Grow the chain one step in both directions until it stops
+        chain = bit
+        while True:
+            grown = chain | ((((chain & forward) << shift) |
+                              ((chain & backward) >> shift)) & own)
+            if grown == chain:
+                break
+            chain = grown
+
+        length = chain.bit_count()
+        if length < k or (exact and length != k):
+            continue
+
+        # The cells just past either end of the chain; 0 when the chain
+        # borders the board boundary
+        after = (chain & forward) << shift & ~chain
+        before = (chain & backward) >> shift & ~chain
+        if not (after & other) or not (before & other):
+            return True
+    return False
+
+
+def neighbourhood_table(height, width, radius):
+    """Return a dict mapping each cell to the cells within radius of it."""
+    key = (height, width, radius)
+    if key not in _neighbourhood_tables:
+        table = {}
+        for row in range(height):
+            for col in range(width):
+                table[row, col] = [
+                    (r, c)
+                    for r in range(max(0, row - radius), min(height, row + radius + 1))
+                    for c in range(max(0, col - radius), min(width, col + radius + 1))
+                    if (r, c) != (row, col)]
+        _neighbourhood_tables[key] = table
+    return _neighbourhood_tables[key]
+
+
+class BitboardGame(Game):
+    """Game backed by one int per colour instead of a list of lists.
+
+    bits[0] holds the black stones and bits[1] the white stones.  The public
+    interface (legal_moves, make_move, terminal_test, to_move, cells) matches
+    Game, so the two can be used interchangeably.  With a radius, the
+    candidate cells are kept as a bitmask of every cell near some stone."""
+
+    def __init__(self, height, width, radius=None, k=5, exact=True):
+        self.players = {True : 'X', False : 'O'}
+        self.first_player = True
+        self.size = max(height, width)
+        self.height = height
+        self.width = width
+        self.k = k
+        self.exact = exact
+        self.coords, self.shifts = bitboard_tables(height, width)
+        self.full = (1 << (height * width)) - 1
+        self.bits = [0, 0]
+        self.num_moves = 0
+        self.last_move = (-1, -1)
+        self.radius = radius
+        self.near = 0
+        self.near_masks = None
+        if radius is not None:
+            table = neighbourhood_table(height, width, radius)
+            self.near_masks = [sum(1 << (r * width + c) for r, c in table[cell])
+                               for cell in self.coords]
+        self.history = []
+        self.zobrist = zobrist_keys(height, width)
+        self.hash = 0
+        self.listeners = []
+        self._init_windows()
+
+    @property
+    def cells(self):
+        """The board as a list of lists of Pieces, built on demand."""
+        black, white = self.bits
+        cells = []
+        for row in range(self.height):
+            line = []
+            for col in range(self.width):
+                bit = 1 << (row * self.width + col)
+                line.append(Piece.BLACK if black & bit else
+                            Piece.WHITE if white & bit else Piece.EMPTY)
+            cells.append(line)
+        return cells
+
+    def legal_moves(self):
+        """Return a list of the allowable moves at this point."""
+        coords = self.coords
+        empty = self.full & ~(self.bits[0] | self.bits[1])
+        if self.near & empty:
+            empty &= self.near
+        moves = []
+        while empty:
+            low = empty & -empty
+            moves.append(coords[low.bit_length() - 1])
+            empty ^= low
+        return moves
+
+    def make_move(self, move):
+        """Return the state that results from making a move from a state."""
+        (row, col) = move
+        index = row * self.width + col
+        self.bits[self.num_moves & 1] |= 1 << index
+        self.hash ^= self.zobrist[self.num_moves & 1][index]
+        self._count_windows(index, self.num_moves & 1)
+        self.num_moves += 1
+        self.history.append((move, self.last_move, self.near))
+        if self.near_masks is not None:
+            self.near |= self.near_masks[index]
+        self.last_move = move
+        for listener in self.listeners:
+            listener.moved(row, col, PIECES[(self.num_moves - 1) & 1])
+
+    def undo_move(self):
+        """Take back the last move made, restoring the previous state."""
+        move, self.last_move, self.near = self.history.pop()
+        (row, col) = move
+        index = row * self.width + col
+        self.num_moves -= 1
+        self.bits[self.num_moves & 1] &= ~(1 << index)
+        self.hash ^= self.zobrist[self.num_moves & 1][index]
+        self._uncount_windows(index, self.num_moves & 1)
+        for listener in self.listeners:
+            listener.unmoved(row, col, PIECES[self.num_moves & 1])
+        return move
+
+    def has_won(self):
+        """Return True if the last move made completed a winning chain."""
+        if self.num_moves == 0:
+            return False
+        (row, col) = self.last_move
+        index = row * self.width + col
+        if not self._fills_window(index, (self.num_moves - 1) & 1, self.k):
+            return False
+        return chain_wins(self.shifts, 1 << index,
+                          self.bits[(self.num_moves - 1) & 1],
+                          self.bits[self.num_moves & 1], self.k, self.exact)
+
+    def is_winning_move(self, move, piece=None):
+        """Return True if putting piece (by default the player to move) on
+        the empty square move would complete a winning chain."""
+        (row, col) = move
+        colour = (piece or self.to_move()).value
+        index = row * self.width + col
+        if not self._fills_window(index, colour, self.k - 1):
+            return False
+        bit = 1 << index
+        return chain_wins(self.shifts, bit, self.bits[colour] | bit,
+                          self.bits[1 - colour], self.k, self.exact)
+
+    def to_move(self):
+        """Return the player whose move it is in this state."""
+        return Piece.BLACK if self.num_moves % 2 == 0 else Piece.WHITE
+
+
 #play_gomoku(Player(), Player())
\ No newline at end of file
@@ -0,0 +1,256 @@
+"""Incremental pattern-table evaluation of Gomoku positions
+
+Every row, column and diagonal long enough to hold a winning chain of
+game.k stones is a line, and each line is kept as a ternary number with
+one digit per cell (0 empty, 1 black, 2 white).  A line is scored by
+splitting it, for each colour, into the segments between the opponent's
+stones and looking the segments up in a pattern table.  Shapes follow the
+game's rules: a chain only counts as a five if it has the winning length
+(exactly k stones unless overlines are allowed) and is not closed at both
+ends by the opponent.  Placing a stone only changes the four lines through
+it, so an Evaluator listening to a core.Game keeps the total up to date
+with four table lookups per move.
+
+"""
+
+from core import Piece, DIRECTIONS
+
+WIN_LENGTH = 5
+
+# What lies past either end of a segment given to segment_shape
+EDGE = '|'
+OPPONENT = 'x'
+
+# Shapes, from weakest to strongest
+NONE = 0
+TWO = 1
+THREE = 2         # broken or closed three: one move from a four
+OPEN_THREE = 3    # one move from an open four
+FOUR = 4          # one move from a five
+OPEN_FOUR = 5     # two ways to make a five
+FIVE = 6
+
+SHAPE_NAMES = ('none', 'two', 'three', 'open three', 'four', 'open four',
+               'five')
+SHAPE_SCORES = (0, 10, 100, 1000, 1500, 100000, 10000000)
+WIN_SCORE = SHAPE_SCORES[FIVE]
+
+# Drop the cached line scores once they get this big
+MAX_LINE_CACHE = 1 << 20
+
+_pattern_tables = {}
+_line_scores = {}
+
+
+def _is_five(stones, length, k, exact, closed):
+    """Return True if a segment of length cells holding stones (a bit per
+    cell) has a chain that wins under core.Game's rules: k stones, or at
+    least k if not exact, not closed at both ends by the opponent."""
+    run = stones
+    for i in range(1, k):
+        run &= stones >> i
+    # Bit i of run is set if cells i .. i + k - 1 all hold stones
+    if exact:
+        run &= ~(stones << 1) & ~(stones >> k)
+    if not run:
+        return False
+    # Only a chain filling the whole segment can be closed at both ends
+    return not closed or stones != (1 << length) - 1
+
+
+def _length_shapes(length, k, exact):
+    """Return (open, closed): the shapes of every segment of length cells,
+    indexed by its stones, for segments with an open end and for segments
+    closed at both ends by the opponent."""
+    tables = []
+    for closed in (False, True):
+        if length < k:
+            tables.append([NONE] * (1 << length))
+            continue
+        if closed and exact and length > k:
+            # No chain of exactly k fills the segment, so being closed
+            # changes nothing
+            tables.append(tables[0])
+            continue
+        shapes = [NONE] * (1 << length)
+        cells = [1 << i for i in range(length)]
+        # A shape is defined by the best shapes it can become in one move,
+        # so fuller segments come first
+        for stones in range((1 << length) - 1, -1, -1):
+            if _is_five(stones, length, k, exact, closed):
+                shapes[stones] = FIVE
+                continue
+            children = [shapes[stones | cell] for cell in cells
+                        if not stones & cell]
+            fives = children.count(FIVE)
+            if fives >= 2:
+                shapes[stones] = OPEN_FOUR
+            elif fives:
+                shapes[stones] = FOUR
+            elif OPEN_FOUR in children:
+                shapes[stones] = OPEN_THREE
+            elif FOUR in children:
+                shapes[stones] = THREE
+            elif OPEN_THREE in children or THREE in children:
+                shapes[stones] = TWO
+        tables.append(shapes)
+    return tuple(tables)
+
+
+def pattern_table(k=WIN_LENGTH, exact=True, length=15):
+    """Return the shape table of the rules k and exact for segments of up
+    to length cells.
+
+    table[n][closed][stones] is the shape of a segment of n cells whose own
+    stones are the set bits of stones, closed at both ends by the opponent
+    if closed (one opponent end is as good as the board edge, since only a
+    chain closed at both ends is blocked).  The table is built in full the
+    first time it is asked for, which Evaluator does when it is created, so
+    no search has to pay for it; that takes about a quarter of a second for
+    15 cells."""
+    table = _pattern_tables.setdefault((k, exact), [])
+    for n in range(len(table), length + 1):
+        table.append(_length_shapes(n, k, exact))
+    return table
+
+
+def segment_shape(segment, k=WIN_LENGTH, exact=True):
+    """Return the shape of segment, a string of '1' (own stone) and '0'
+    (empty) with EDGE or OPPONENT as its first and last characters, for
+    what lies past its ends.  k and exact are the rules of core.Game."""
+    cells = segment[1:-1]
+    stones = sum(1 << i for i, cell in enumerate(cells) if cell == '1')
+    closed = segment[0] == OPPONENT and segment[-1] == OPPONENT
+    return pattern_table(k, exact, len(cells))[len(cells)][closed][stones]
+
+
+def line_score(length, index, k=WIN_LENGTH, exact=True):
+    """Return the (black, white) scores of a line of the given length whose
+    cells are the ternary digits of index."""
+    key = (length, index, k, exact)
+    scores = _line_scores.get(key)
+    if scores is not None:
+        return scores
+    table = pattern_table(k, exact, length)
+    digits = []
+    for i in range(length):
+        digits.append(index % 3)
+        index //= 3
+    scores = []
+    for own, other in ((1, 2), (2, 1)):
+        score = 0
+        # The segment so far: its number of cells, its own stones and
+        # whether the opponent closes its start
+        cells = stones = 0
+        closed = False
+        for digit in digits + [None]:
+            if digit is None or digit == other:
+                if cells >= k:
+                    shape = table[cells][closed and digit is not None][stones]
+                    score += SHAPE_SCORES[shape]
+                cells = stones = 0
+                closed = True
+            else:
+                if digit == own:
+                    stones |= 1 << cells
+                cells += 1
+        scores.append(score)
+    if len(_line_scores) >= MAX_LINE_CACHE:
+        _line_scores.clear()
+    scores = _line_scores[key] = tuple(scores)
+    return scores
+
+
+_line_tables = {}
+
+
+def line_table(height, width, k=WIN_LENGTH):
+    """Return (lengths, cell_lines) for a height x width board.
+
+    lengths[i] is the number of cells of line i, one of the lines of at
+    least k cells, and cell_lines maps each cell to (line, ternary place
+    value) pairs for the lines through it."""
+    key = (height, width, k)
+    if key not in _line_tables:
+        lengths = []
+        cell_lines = {(row, col): [] for row in range(height)
+                      for col in range(width)}
+        for dr, dc in DIRECTIONS:
+            for row in range(height):
+                for col in range(width):
+                    # Only start a line on its first cell
+                    if 0 <= row - dr < height and 0 <= col - dc < width:
+                        continue
+                    cells = []
+                    r, c = row, col
+                    while 0 <= r < height and 0 <= c < width:
+                        cells.append((r, c))
+                        r, c = r + dr, c + dc
+                    if len(cells) < k:
+                        continue
+                    line = len(lengths)
+                    lengths.append(len(cells))
+                    for i, cell in enumerate(cells):
+                        cell_lines[cell].append((line, 3 ** i))
+        _line_tables[key] = (lengths, cell_lines)
+    return _line_tables[key]
+
+
+class Evaluator:
+    """Keeps the pattern score of a core.Game up to date as moves are made
+    and taken back, scoring shapes by the game's k and exact rules.
+    Creating one attaches it to the game, and builds the pattern table of
+    the rules if this process has not built it yet."""
+
+    def __init__(self, game):
+        self.game = game
+        self.k = game.k
+        self.exact = game.exact
+        self.lengths, self.cell_lines = line_table(game.height, game.width,
+                                                   game.k)
+        pattern_table(game.k, game.exact, max(self.lengths, default=0))
+        self.rescore()
+        game.listeners.append(self)
+
+    def rescore(self):
+        """Recompute every line from the board."""
+        cells = self.game.cells
+        self.lines = [0] * len(self.lengths)
+        for (row, col), lines in self.cell_lines.items():
+            piece = cells[row][col]
+            if piece != Piece.EMPTY:
+                for line, place in lines:
+                    self.lines[line] += (piece.value + 1) * place
+        self.scores = [line_score(length, index, self.k, self.exact)
+                       for length, index in zip(self.lengths, self.lines)]
+        self.totals = [sum(score[0] for score in self.scores),
+                       sum(score[1] for score in self.scores)]
+
+    def moved(self, row, col, piece):
+        self._update(row, col, piece.value + 1)
+
+    def unmoved(self, row, col, piece):
+        self._update(row, col, -(piece.value + 1))
+
+    def _update(self, row, col, digit):
+        lines, lengths, scores, totals = (self.lines, self.lengths,
+                                          self.scores, self.totals)
+        k, exact = self.k, self.exact
+        for line, place in self.cell_lines[row, col]:
+            index = lines[line] = lines[line] + digit * place
+            old = scores[line]
+            new = scores[line] = line_score(lengths[line], index, k, exact)
+            totals[0] += new[0] - old[0]
+            totals[1] += new[1] - old[1]
+
+    def score(self, piece):
+        """Return the score of the position for piece."""
+        return self.totals[piece.value] - self.totals[1 - piece.value]
+
+    def evaluate(self):
+        """Return the score of the position for the player to move."""
+        return self.score(self.game.to_move())
+
+    def detach(self):
+        """Stop following the game."""
+        self.game.listeners.remove(self)
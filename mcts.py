@@ -0,0 +1,184 @@
+"""Monte Carlo tree search for Gomoku, built on core.Game
+
+The tree is grown with UCT: children are chosen by win rate plus
+exploration * sqrt(ln(parent visits) / visits), and new nodes get their
+moves from game.legal_moves().  Playouts do not touch the game at all: they
+run on a pair of bitboard ints, shuffle the empty cells once and fill them
+in that order until somebody wins.  The tree below the move actually played
+is kept for the next search.
+
+"""
+
+import math
+from random import Random
+from time import perf_counter
+
+from core import Piece, bitboard_tables, chain_wins
+
+DRAW = 2
+
+
+class Node:
+    """A position in the search tree.  colour is the colour index (0 black,
+    1 white) of the player who played move to get here, wins counts their
+    playout wins through this node (draws count half) and terminal is the
+    winning colour, DRAW, or None if the game goes on."""
+
+    __slots__ = ('move', 'parent', 'colour', 'children', 'untried', 'wins',
+                 'visits', 'terminal')
+
+    def __init__(self, move, parent, colour, untried, terminal=None):
+        self.move = move
+        self.parent = parent
+        self.colour = colour
+        self.children = []
+        self.untried = untried
+        self.wins = 0.0
+        self.visits = 0
+        self.terminal = terminal
+
+
+class MCTS:
+    """UCT search that keeps its tree between moves of the same game.
+
+    After a search, playouts is the number of playouts run and
+    playouts_per_second their rate."""
+
+    def __init__(self, exploration=1.4, seed=None):
+        self.exploration = exploration
+        self.random = Random(seed)
+        self.game = None
+        self.root = None
+        self.root_moves = 0
+        self.playouts = 0
+        self.playouts_per_second = 0.0
+
+    def search(self, game, time_limit=1.0, max_playouts=None):
+        """Return the most visited move after time_limit seconds, or after
+        max_playouts playouts if that comes first."""
+        self._set_root(game)
+        self.coords, self.shifts = bitboard_tables(game.height, game.width)
+        self.k, self.exact = game.k, game.exact
+        cells = game.cells
+        self.bits = [0, 0]
+        self.empty = []
+        for index, (row, col) in enumerate(self.coords):
+            piece = cells[row][col]
+            if piece == Piece.EMPTY:
+                self.empty.append(index)
+            else:
+                self.bits[piece.value] |= 1 << index
+
+        start = perf_counter()
+        deadline = start + time_limit
+        self.playouts = 0
+        while max_playouts is None or self.playouts < max_playouts:
+            self._playout(game)
+            self.playouts += 1
+            if not self.playouts & 15 and perf_counter() > deadline:
+                break
+        self.playouts_per_second = self.playouts / max(perf_counter() - start,
+                                                       1e-9)
+        best = max(self.root.children, key=lambda child: child.visits)
+        return best.move
+
+    def _set_root(self, game):
+        """Move the root down to the current position, or start afresh."""
+        root = None
+        if (self.root is not None and self.game is game and
+                game.num_moves >= self.root_moves):
+            root = self.root
+            for entry in game.history[self.root_moves:]:
+                move = entry[0]
+                root = next((child for child in root.children
+                             if child.move == move), None)
+                if root is None:
+                    break
+        if root is None:
+            root = Node(None, None, 1 - game.to_move().value,
+                        self._moves(game))
+        root.parent = None
+        self.game = game
+        self.root = root
+        self.root_moves = game.num_moves
+
+    def _moves(self, game):
+        moves = game.legal_moves()
+        self.random.shuffle(moves)
+        return moves
+
+    def _playout(self, game):
+        """Select, expand, play out and back up one playout."""
+        node = self.root
+        bits = self.bits[:]
+        made = 0
+        try:
+            # Selection
+            while not node.untried and node.children and node.terminal is None:
+                node = self._select(node)
+                game.make_move(node.move)
+                made += 1
+                bits[node.colour] |= 1 << (node.move[0] * game.width +
+                                           node.move[1])
+
+            # Expansion
+            if node.terminal is None and node.untried:
+                move = node.untried.pop()
+                colour = 1 - node.colour
+                game.make_move(move)
+                made += 1
+                bits[colour] |= 1 << (move[0] * game.width + move[1])
+                if game.has_won():
+                    terminal = colour
+                elif game.num_moves == game.height * game.width:
+                    terminal = DRAW
+                else:
+                    terminal = None
+                child = Node(move, node, colour,
+                             self._moves(game) if terminal is None else [],
+                             terminal)
+                node.children.append(child)
+                node = child
+        finally:
+            for i in range(made):
+                game.undo_move()
+
+        # Simulation
+        if node.terminal is not None:
+            winner = node.terminal
+        else:
+            winner = self._rollout(bits, 1 - node.colour)
+
+        # Backpropagation
+        while node is not None:
+            node.visits += 1
+            if winner == node.colour:
+                node.wins += 1
+            elif winner == DRAW:
+                node.wins += 0.5
+            node = node.parent
+
+    def _select(self, node):
+        """Return the child of node with the best UCT value."""
+        log_visits = math.log(node.visits)
+        exploration = self.exploration
+        return max(node.children,
+                   key=lambda child: child.wins / child.visits +
+                   exploration * math.sqrt(log_visits / child.visits))
+
+    def _rollout(self, bits, colour):
+        """Play random moves from bits with colour to move and return the
+        winning colour or DRAW."""
+        occupied = bits[0] | bits[1]
+        order = [index for index in self.empty if not occupied >> index & 1]
+        self.random.shuffle(order)
+        shifts, k, exact = self.shifts, self.k, self.exact
+        own, other = bits[colour], bits[1 - colour]
+        for index in order:
+            bit = 1 << index
+            own |= bit
+            if chain_wins(shifts, bit, own, other, k, exact):
+                return colour
+            own, other = other, own
+            colour = 1 - colour
+        return DRAW
@@ -6,12 +6,12 @@ from time import sleep
 
 
 def play():
-    players = (Player(),Player())
-    game = Game(15,15)
+    players = (Player('alphabeta'),Player())
+    game = Game(15,15,radius=2)
 
     while True:
         for player in players:
-            move = player.random_search(game)
+            move = player.search(game)
             game.make_move(move)
             game.display()
 
@@ -6,6 +6,8 @@ from utils import *
 from tkinter import *
 import random, re, time
 
+from worker import ProcessWorker, SearchWorker
+
 # from myothello import boardstate_utility_fn, alphabeta_parameters
 
 # give names to the internal piece value representations
@@ -31,6 +33,152 @@ All_Squares = calc_all_squares()
 All_Directions = [-18, -17, -16, -1, 1, 16, 17, 18]
 BigInitialValue = 1000000
 
+
+def calc_zobrist_keys():
+    """Function to calculate 64-bit Zobrist keys, indexed by [player][square].
+    The generator is seeded so every process gets the same keys."""
+    rng = random.Random(289)
+    keys = [[0] * 289 for player in (Empty, Black, White)]
+    for player in (Black, White):
+        for sq in All_Squares:
+            keys[player][sq] = rng.getrandbits(64)
+    return keys, rng.getrandbits(64)
+
+
+# Zobrist_White_To_Move is xored into the hash when White is to move
+Zobrist_Keys, Zobrist_White_To_Move = calc_zobrist_keys()
+
+
+def calc_bit_tables():
+    """Function to calculate the bitboard layout.  Bit row*15+col of a
+    bitboard stands for square (row+1)*17+col+1 of the board list.
+
+    Each direction is a pair (shift, mask): moving a bitboard one step in
+    the direction shifts it by shift bits, and mask holds the squares a
+    step can land on, which removes the bits that wrapped around the edge
+    of a row."""
+    square_bits = [0] * 289
+    for cell, sq in enumerate(All_Squares):
+        square_bits[sq] = 1 << cell
+    full = (1 << len(All_Squares)) - 1
+    first_column = sum(1 << (row * 15) for row in range(15))
+    not_first = full & ~first_column
+    not_last = full & ~(first_column << 14)
+    directions = [(-16, not_last), (-15, full), (-14, not_first),
+                  (-1, not_last), (1, not_first),
+                  (14, not_last), (15, full), (16, not_first)]
+    return square_bits, list(All_Squares), full, directions
+
+
+Square_Bits, Bit_Squares, All_Bits, Bit_Directions = calc_bit_tables()
+
+
+def board_bits(board):
+    """Return the bitboards of a board list as (0, black, white), so that
+    they can be indexed by player."""
+    black = white = 0
+    for sq in All_Squares:
+        if board[sq] == Black:
+            black |= Square_Bits[sq]
+        elif board[sq] == White:
+            white |= Square_Bits[sq]
+    return (0, black, white)
+
+
+def bit_squares(bits):
+    """Return the squares of the set bits of bits, in ascending order."""
+    squares = []
+    while bits:
+        low = bits & -bits
+        squares.append(Bit_Squares[low.bit_length() - 1])
+        bits ^= low
+    return squares
+
+
+def bit_count(bits):
+    return bin(bits).count('1')
+
+
+def bit_legal_moves(own, other, first=False):
+    """Return the bitboard of the legal moves of the player owning own.
+    With first, stop at the first direction that gives any moves, which is
+    enough to tell whether there are moves at all.
+
+    For each direction a Kogge-Stone fill grows own through runs of other
+    in four doubling steps (1, 2, 4 and 8 squares, enough for the longest
+    run of 13); an empty square one step beyond a run reached that way is
+    a legal move."""
+    empty = All_Bits & ~(own | other)
+    moves = 0
+    for shift, mask in Bit_Directions:
+        pro = other & mask
+        if shift > 0:
+            gen = own | pro & (own << shift)
+            pro &= pro << shift
+            gen |= pro & (gen << 2 * shift)
+            pro &= pro << 2 * shift
+            gen |= pro & (gen << 4 * shift)
+            pro &= pro << 4 * shift
+            gen |= pro & (gen << 8 * shift)
+            moves |= ((gen & ~own) << shift) & mask & empty
+        else:
+            shift = -shift
+            gen = own | pro & (own >> shift)
+            pro &= pro >> shift
+            gen |= pro & (gen >> 2 * shift)
+            pro &= pro >> 2 * shift
+            gen |= pro & (gen >> 4 * shift)
+            pro &= pro >> 4 * shift
+            gen |= pro & (gen >> 8 * shift)
+            moves |= ((gen & ~own) >> shift) & mask & empty
+        if first and moves:
+            break
+    return moves
+
+
+def bit_flips(bit, own, other):
+    """Return the bitboard of the discs flipped by playing the square bit
+    for the player owning own: in each direction, the run of other grown
+    from bit as in bit_legal_moves, if one of own closes it."""
+    flips = 0
+    for shift, mask in Bit_Directions:
+        pro = other & mask
+        if shift > 0:
+            gen = bit | pro & (bit << shift)
+            pro &= pro << shift
+            gen |= pro & (gen << 2 * shift)
+            pro &= pro << 2 * shift
+            gen |= pro & (gen << 4 * shift)
+            pro &= pro << 4 * shift
+            gen |= pro & (gen << 8 * shift)
+            if (gen << shift) & mask & own:
+                flips |= gen ^ bit
+        else:
+            shift = -shift
+            gen = bit | pro & (bit >> shift)
+            pro &= pro >> shift
+            gen |= pro & (gen >> 2 * shift)
+            pro &= pro >> 2 * shift
+            gen |= pro & (gen >> 4 * shift)
+            pro &= pro >> 4 * shift
+            gen |= pro & (gen >> 8 * shift)
+            if (gen >> shift) & mask & own:
+                flips |= gen ^ bit
+    return flips
+
+
+# When Check_Moves is true, every BoardState.make_move compares its result
+# with the square-by-square scan of legal_p and would_flip_p (see
+# BoardState.check_move).  That is slow; it is meant for testing changes to
+# the bitboard code, for instance with benchmark.py's perft.
+Check_Moves = False
+
+
+class MoveGenerationError(Exception):
+    """Raised by BoardState.check_move when the bitboards disagree with the
+    scan."""
+
+
 # Constants for graphics
 GridSize = 25  # size in pixels of each square on playing board
 PieceSize = GridSize - 8  # size in pixels of each playing piece
@@ -40,6 +188,7 @@ HiliteColor = '#cffffc'  # color of highlighted square - light green
 PlayerColors = ('', '#FFFD1B', '#0102FF')  # rgb values for black, white
 PlayerNames = ('', 'Black', 'White')  # Names of players as displayed to the user
 MoveDelay = 1000  # pause 1000 msec (1 sec) between moves
+PollDelay = 100  # check on a thinking ai every 100 msec
 fn_array = [None, None]  # array to hold user-defined functions
 
 
@@ -122,60 +271,109 @@ def alphabeta_full_search(state, game):
     return action
 
 
-count = 0
-testing = 0
+class SearchStats:
+    """Counters filled in by alphabeta_search.
 
+    nodes counts every state searched, the root included, and nodes_by_depth
+    splits them by distance from the root.  leaf_evaluations counts calls of
+    the evaluation function.  cutoffs[i] is the number of beta cutoffs
+    caused by the i-th successor tried (0 is the first), so a good move
+    order piles them up at the low indexes.  iterations holds (depth,
+    seconds, nodes) for each search of the root.  pv is the principal
+    variation of the last one: the move chosen and, if the search looked
+    that far, the opponent's expected reply."""
 
-def alphabeta_search(state, game, d=4, cutoff_test=None, eval_fn=None):
+    def __init__(self):
+        self.nodes = 0
+        self.leaf_evaluations = 0
+        self.nodes_by_depth = []
+        self.cutoffs = []
+        self.iterations = []
+        self.pv = []
+
+    def _node(self, depth):
+        self.nodes += 1
+        if depth >= len(self.nodes_by_depth):
+            self.nodes_by_depth.extend([0] * (depth + 1 -
+                                             len(self.nodes_by_depth)))
+        self.nodes_by_depth[depth] += 1
+
+    def _cutoff(self, index):
+        if index >= len(self.cutoffs):
+            self.cutoffs.extend([0] * (index + 1 - len(self.cutoffs)))
+        self.cutoffs[index] += 1
+
+    def branching_factors(self):
+        """Return the effective branching factor at each depth: the nodes at
+        depth + 1 per node at depth."""
+        by_depth = self.nodes_by_depth
+        return [by_depth[depth + 1] / by_depth[depth]
+                for depth in range(len(by_depth) - 1) if by_depth[depth]]
+
+    def seconds(self):
+        return sum(iteration[1] for iteration in self.iterations)
+
+    def as_dict(self):
+        return {'nodes': self.nodes,
+                'leaf_evaluations': self.leaf_evaluations,
+                'nodes_by_depth': list(self.nodes_by_depth),
+                'branching_factors': self.branching_factors(),
+                'cutoffs': list(self.cutoffs),
+                'iterations': list(self.iterations),
+                'pv': list(self.pv)}
+
+    def __repr__(self):
+        return '<%s %d nodes, %d leaves>' % (self.__class__.__name__,
+                                            self.nodes, self.leaf_evaluations)
+
+
+class SearchCancelled(Exception):
+    """Raised by alphabeta_search when its stop Event is set."""
+
+
+def alphabeta_search(state, game, d=4, cutoff_test=None, eval_fn=None,
+                     stats=None, stop=None):
     """Search game to determine best action; use alpha-beta pruning.
-    This version cuts off search and uses an evaluation function."""
-    global count
-    global testing
+    This version cuts off search and uses an evaluation function.
+    If stats is a SearchStats, the search adds its counters to it.  If stop
+    is a threading Event, setting it makes the search raise
+    SearchCancelled."""
 
-    player = game.to_move(state)
-    count = 0
-    starttime = time.clock()
+    if stats is None:
+        stats = SearchStats()
 
     def max_value(state, alpha, beta, depth):
-        global count, testing
-        if testing:
-            print("  " * depth, "Max  alpha: ", alpha, " beta: ", beta, " depth: ", depth)
+        stats._node(depth + 1)
+        if stop is not None and stop.is_set():
+            raise SearchCancelled()
         if cutoff_test(state, depth):
-            if testing:
-                print("  " * depth, "Max cutoff returning ", eval_fn(state))
+            stats.leaf_evaluations += 1
             return eval_fn(state)
         v = -BigInitialValue
-        succ = game.successors(state)
-        count = count + len(succ)
-        if testing:
-            print("  " * depth, "maxDepth: ", depth, "Total:", count, "Successors: ", len(game.successors(state)))
-        for (a, s) in succ:
+        for index, (a, s) in enumerate(game.successors(state)):
             v = max(v, min_value(s, alpha, beta, depth + 1))
-            if testing:
-                print("  " * depth, "max best value:", v)
             if v >= beta:
+                stats._cutoff(index)
                 return v
             alpha = max(alpha, v)
         return v
 
     def min_value(state, alpha, beta, depth):
-        global count
-        if testing:
-            print("  " * depth, "Min  alpha: ", alpha, " beta: ", beta, " depth: ", depth)
+        stats._node(depth + 1)
+        if stop is not None and stop.is_set():
+            raise SearchCancelled()
         if cutoff_test(state, depth):
-            if testing:
-                print("  " * depth, "Min cutoff returning ", eval_fn(state))
+            stats.leaf_evaluations += 1
             return eval_fn(state)
         v = BigInitialValue
-        succ = game.successors(state)
-        count = count + len(succ)
-        if testing:
-            print("  " * depth, "minDepth: ", depth, "Total:", count, "Successors: ", len(game.successors(state)))
-        for (a, s) in succ:
-            v = min(v, max_value(s, alpha, beta, depth + 1))
-            if testing:
-                print("  " * depth, "min best value:", v)
+        for index, (a, s) in enumerate(game.successors(state)):
+            w = max_value(s, alpha, beta, depth + 1)
+            if w < v:
+                v = w
+                if depth == 0:
+                    reply[:] = [a]
             if v <= alpha:
+                stats._cutoff(index)
                 return v
             beta = min(beta, v)
         return v
@@ -185,19 +383,21 @@ def alphabeta_search(state, game, d=4, cutoff_test=None, eval_fn=None):
     cutoff_test = (cutoff_test or
                    (lambda state, depth: depth > d or game.terminal_test(state)))
     eval_fn = eval_fn or (lambda state: game.utility(state, game.current_player))
-    action, state = argmax(game.successors(state),
-                           #                           lambda ((a, s)): min_value(s, -BigInitialValue, BigInitialValue, 0))
-                           lambda a_s: min_value(a_s[1], -BigInitialValue, BigInitialValue, 0))
-
-    stoptime = time.clock()
-    elapsed = stoptime - starttime
-    print("Final count: ", count, "Time: ")
-    print(" %.2f seconds" % elapsed)
-    if count > 0:
-        spm = elapsed / count
-    else:
-        spm = -1
-    print(" %.7f seconds per move for player %s, depth %d" % (spm, player, d))
+    start = time.perf_counter()
+    nodes = stats.nodes
+    stats._node(0)
+    # Pick the best root move (the first one on ties).  utils.argmax would
+    # search the first successor twice.  min_value leaves the opponent's
+    # best answer to each root move in reply.
+    best = action = None
+    reply = []
+    for (a, s) in game.successors(state):
+        reply.clear()
+        v = min_value(s, -BigInitialValue, BigInitialValue, 0)
+        if best is None or v > best:
+            best, action = v, a
+            stats.pv = [a] + reply
+    stats.iterations.append((d, time.perf_counter() - start, stats.nodes - nodes))
     return action
 
 
@@ -265,13 +465,90 @@ def play_game(game, *players):
                 return game.utility(state, players[0])
 
 
+def player_search(state, game, player, remainingTime, stats=None, stop=None):
+    """Search state with the parameters player asks for and return (move,
+    stats).  Unlike the default of alphabeta_search, the evaluation does not
+    depend on game.current_player, so this can run while another player is
+    searching."""
+    params = player.alphabeta_parameters(state, remainingTime)
+    eval_fn = params[2] or (lambda s: game.utility(s, player))
+    if stats is None:
+        stats = SearchStats()
+    move = alphabeta_search(state, game, params[0], params[1], eval_fn,
+                            stats, stop)
+    return move, stats
+
+
+class Ponderer:
+    """Thinks on the opponent's time.
+
+    After player moves into state, the opponent's reply is predicted from
+    the principal variation and the position after it is searched for
+    player in a background process.  When the opponent has moved, hit()
+    tells whether the prediction was right: if so the search carries on and
+    its (move, stats) is the player's answer, otherwise it is thrown away."""
+
+    def __init__(self, game, player, state, reply, remainingTime):
+        self.player = player
+        self.reply = reply
+        self.worker = ProcessWorker().start(player_search,
+                                            state.make_move(reply), game,
+                                            player, remainingTime)
+
+    def hit(self, move):
+        """Return True if move is the predicted reply; cancel if not."""
+        if move == self.reply:
+            return True
+        self.cancel()
+        return False
+
+    def result(self):
+        """Wait for the search and return its (move, stats)."""
+        self.worker.wait()
+        if self.worker.error is not None:
+            raise self.worker.error
+        return self.worker.result
+
+    def cancel(self):
+        self.worker.cancel()
+
+
 def play_othello(game=None, initialTime=1800,
-                 player1=othello_player("p1"), player2=othello_player("p2")):
-    "Play an 2-person, move-alternating Othello game."
+                 player1=othello_player("p1"), player2=othello_player("p2"),
+                 database=None, on_search=None, ponder=False):
+    """Play an 2-person, move-alternating Othello game.  If database is a
+    records.GameDatabase, the game is appended to it when it ends.  If
+    given, on_search(player, move, stats) is called after every search with
+    its SearchStats.  With ponder, each player keeps searching on the
+    opponent's time (see Ponderer)."""
     # This is play_game with stuff added to keep track of time.
     game = game or Othello()
     state = game.initial
     players = (player1, player2)
+    moves = []
+    ponderers = {}
+
+    def announce():
+        diff = state.count_difference()
+        if state.to_move == Black:
+            if diff > 0:
+                print("Player", player1.name, "WINS")
+            else:
+                print("Player", player2.name, "WINS")
+        else:
+            if diff > 0:
+                print("Player", player2.name, "WINS")
+            else:
+                print("Player", player1.name, "WINS")
+
+    def finish(finished=True):
+        for ponderer in ponderers.values():
+            ponderer.cancel()
+        if database is not None:
+            from records import othello_record
+            database.append(othello_record(moves, state, finished))
+        return state.count_difference()
+
     # initialize the amount of time for each player.  Units are seconds.
     # 1800 seconds is 30 minutes
     clocks = {player1: initialTime, player2: initialTime}
@@ -282,10 +559,19 @@ def play_othello(game=None, initialTime=1800,
         for player in players:
             game.current_player = player
             # game.calculate_utility = player.calculate_utility
-            params = player.alphabeta_parameters(state, clocks[player])
-            startTime = time.clock()
-            move = alphabeta_search(state, game, params[0], params[1], params[2])
-            endTime = time.clock()
+            ponderer = ponderers.pop(player, None)
+            startTime = time.perf_counter()
+            if ponderer is not None and ponderer.hit(moves[-1]):
+                # Only the time spent since our turn began counts
+                move, stats = ponderer.result()
+            else:
+                params = player.alphabeta_parameters(state, clocks[player])
+                stats = SearchStats()
+                move = alphabeta_search(state, game, params[0], params[1],
+                                        params[2], stats)
+            endTime = time.perf_counter()
+            if on_search is not None:
+                on_search(player, move, stats)
             moveTime = endTime - startTime
             if moveTime > clocks[player]:
                 print("Player", player.name, "took too much time and loses.")
@@ -294,7 +580,7 @@ def play_othello(game=None, initialTime=1800,
                 else:
                     print("Player", player1.name, "WINS")
                 # Should really just return some utility that reflects player losing.
-                return state.count_difference()
+                return finish(False)
             else:
                 clocks[player] -= moveTime
             if move == None:
@@ -302,18 +588,8 @@ def play_othello(game=None, initialTime=1800,
                 # this means the player passes, so remember that
                 if previousPass:
                     # game over because both players passed
-                    diff = state.count_difference()
-                    if state.to_move == Black:
-                        if diff > 0:
-                            print("Player", player1.name, "WINS")
-                        else:
-                            print("Player", player2.name, "WINS")
-                    else:
-                        if diff > 0:
-                            print("Player", player2.name, "WINS")
-                        else:
-                            print("Player", player1.name, "WINS")
-                    return state.count_difference()
+                    announce()
+                    return finish()
                 else:
                     # remember that this player passed
                     previousPass = 1
@@ -321,10 +597,15 @@ def play_othello(game=None, initialTime=1800,
                 # No passing, so just make move normally
                 previousPass = 0
             state = game.make_move(move, state)
+            moves.append(move)
+            if ponder and stats.pv[1:] and stats.pv[0] == move:
+                ponderers[player] = Ponderer(game, player, state, stats.pv[1],
+                                             clocks[player])
             print("Time remaining player 1:", clocks[player1], "player 2:", clocks[player2])
             game.display(state)
             if game.terminal_test(state):
-                return state.count_difference()
+                announce()
+                return finish()
 
 
 # ______________________________________________________________________________
@@ -381,14 +662,25 @@ class Game:
 # Beginning of Othello classes
 
 class BoardState:
-    """Holds one state of the Othello board."""
+    """Holds one state of the Othello board.
+
+    The discs are kept twice: in the _board list, which the displays and
+    evaluation functions read, and as the bitboards _bits = (0, black,
+    white) that move generation works on.  bits may be left out when
+    constructing a BoardState; they are then computed from board.
+
+    The legal moves are only calculated when first asked for, since most
+    states a search creates are evaluated without being expanded, and
+    has_legal_move and game_over answer without listing them."""
 
-    def __init__(self, to_move=None, utility=None, board=None, moves=None):
+    def __init__(self, to_move=None, utility=None, board=None, moves=None,
+                 bits=None):
         if to_move:  # assume if to_move is not None, then neither are the rest
             self.to_move = to_move
             self._utility = utility
             self._board = board
             self._moves = moves
+            self._bits = bits if bits is not None else board_bits(board)
         else:
             self.create_initial_boardstate()
 
@@ -411,9 +703,10 @@ class BoardState:
         b[63] = Black;
         b[71] = Black;
         self._board = b
+        self._bits = board_bits(b)
 
         self.to_move = Black  # Black has the first move
-        self._moves = self.calculate_legal_moves()
+        self._moves = None
         self._utility = self.count_difference()
 
     def find_bracketing_piece(self, square, player, dir):
@@ -451,45 +744,100 @@ class BoardState:
 
     def legal_moves(self):
         "Return a list of legal moves for player."
-        return self._moves
+        moves = self._move_list
+        if moves is None:
+            moves = self._move_list = self.calculate_legal_moves()
+        return moves
+
+    # _moves is the list legal_moves returns, calculated on first use
+    _moves = property(legal_moves)
+
+    @_moves.setter
+    def _moves(self, moves):
+        self._move_list = moves
+
+    def has_legal_move(self, player=None):
+        """Return whether player (by default the player to move) has a move
+        other than passing, stopping at the first direction that gives one."""
+        player = player or self.to_move
+        if player == self.to_move and self._move_list is not None:
+            return self._move_list != [None]
+        return bit_legal_moves(self._bits[player],
+                               self._bits[opponent(player)], True) != 0
+
+    def game_over(self):
+        "Return whether neither player can move."
+        return not (self.has_legal_move() or
+                    self.has_legal_move(opponent(self.to_move)))
 
     def getxyMoves(self):
         "Return a list of (x, y) pairs for legal moves."
         moves = []
-        for move in self._moves:
+        for move in self.legal_moves():
             if move != None:
                 moves.append(((move // 17) - 1, (move % 17) - 1))
         return tuple(moves)
 
     def calculate_legal_moves(self):
         """Calculate the legal moves in the current BoardState."""
-        moves = []
-        for poss in All_Squares:
-            if self.legal_p(poss):
-                moves.append(poss)
+        moves = bit_squares(bit_legal_moves(self._bits[self.to_move],
+                                            self._bits[opponent(self.to_move)]))
         # if there are no legal moves, append None (meaning pass)
         if len(moves) == 0:
             moves.append(None)
             # print "appending None to indicate no legal moves"
         return moves
 
-    def make_flips(self, move, player, dir):
-        "Make any flips in the given direction. Changes self."
-        bracketer = self.would_flip_p(move, player, dir)
-        if bracketer:
-            c = move + dir
-            while c != bracketer:
-                self._board[c] = player
-                c = c + dir
+    def scan_legal_moves(self):
+        """Calculate the legal moves by testing every square with legal_p,
+        the slow way that check_move compares the bitboards with."""
+        moves = [poss for poss in All_Squares if self.legal_p(poss)]
+        return moves or [None]
+
+    def check_move(self, move, newboard):
+        """Check newboard, the result of make_move(move), against a scan of
+        the board list.  Raise MoveGenerationError if the discs flipped, the
+        bitboards or the legal moves differ from the scan's."""
+        board = self._board[:]
+        if move != None:
+            board[move] = self.to_move
+            for dir in All_Directions:
+                bracketer = self.would_flip_p(move, self.to_move, dir)
+                if bracketer:
+                    c = move + dir
+                    while c != bracketer:
+                        board[c] = self.to_move
+                        c = c + dir
+        if newboard._board != board:
+            raise MoveGenerationError("wrong discs flipped by move %s" % move)
+        if newboard._bits != board_bits(board):
+            raise MoveGenerationError("bitboards differ from the board "
+                                      "after move %s" % move)
+        moves = newboard.scan_legal_moves()
+        if newboard.has_legal_move() != (moves != [None]):
+            raise MoveGenerationError("has_legal_move wrong after move %s"
+                                      % move)
+        if newboard.legal_moves() != moves:
+            raise MoveGenerationError("legal moves %s after move %s, scan "
+                                      "gives %s" % (newboard.legal_moves(),
+                                                    move, moves))
 
     def make_move(self, move):
         "Return a new BoardState reflecting move made from given board state."
-        newboard = BoardState(opponent(self.to_move), None, self._board[:], None)
+        player = self.to_move
+        other = opponent(player)
+        board = self._board[:]
+        bits = list(self._bits)
         if move != None:
-            newboard._board[move] = self.to_move
-            for dir in All_Directions:
-                newboard.make_flips(move, self.to_move, dir)
-        newboard._moves = newboard.calculate_legal_moves()
+            flips = bit_flips(Square_Bits[move], bits[player], bits[other])
+            bits[player] |= Square_Bits[move] | flips
+            bits[other] ^= flips
+            board[move] = player
+            for sq in bit_squares(flips):
+                board[sq] = player
+        newboard = BoardState(other, None, board, None, tuple(bits))
+        if Check_Moves:
+            self.check_move(move, newboard)
         # utility for the new state is calculated in the game version of
         # this method.  That is kind of an ugly hack, but necessary to make
         # it easier to allow a per-player utility function.
@@ -507,7 +855,17 @@ class BoardState:
 
     def count_difference(self):
         "Return count of player's pieces minus opponent's pieces."
-        return self._board.count(self.to_move) - self._board.count(opponent(self.to_move))
+        return (bit_count(self._bits[self.to_move]) -
+                bit_count(self._bits[opponent(self.to_move)]))
+
+    def zobrist_hash(self):
+        "Return the 64-bit Zobrist hash of the position and player to move."
+        h = Zobrist_White_To_Move if self.to_move == White else 0
+        board = self._board
+        for sq in All_Squares:
+            if board[sq] != Empty:
+                h ^= Zobrist_Keys[board[sq]][sq]
+        return h
 
 
 class Othello(Game):
@@ -523,11 +881,11 @@ class Othello(Game):
     def display(self, boardstate):
         print(' ', 'a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i', 'j', 'k', 'l', 'm', 'n', 'o')
         for row in range(1, 16):
-            print(row)
+            print(row, end=' ')
             for col in range(1, 16):
                 print({Empty: '.',
                        Black: 'B',
-                       White: 'W'}[boardstate._board[col + 10 * row]])
+                       White: 'W'}[boardstate._board[col + 17 * row]], end=' ')
             print()
         print()
 
@@ -544,7 +902,7 @@ class Othello(Game):
         return newBoard
 
     def terminal_test(self, boardstate):
-        return len(boardstate._moves) == 0
+        return boardstate.game_over()
 
     def calculate_utility(self, boardstate):
         return boardstate.count_difference()
@@ -574,14 +932,16 @@ class Board:
             self.squareId = 0  # canvas id of rectangle
             self.pieceId = 0  # canvas id of circle
 
-    def __init__(self, game, strategies=(), initialTime=1800):
+    def __init__(self, game, strategies=(), initialTime=1800, ponder=False):
         '''Initialize the interactive game board.  An optional list of
            computer opponent strategies can be supplied which will be
-           displayed in a menu to the user.
+           displayed in a menu to the user.  With ponder, computer players
+           think on their opponent's time (see Ponderer).
         '''
 
         self.game = game
         self.initialTime = initialTime
+        self.ponder = ponder
         self.passedTest = ''
         # create a Tk frame to hold the gui
         self._frame = Frame()
@@ -637,6 +997,11 @@ class Board:
 
         # _afterId tracks the current 'after' proc so it can be cancelled if needed
         self._afterId = 0
+        # _worker is the SearchWorker of the ai thinking now, if any
+        self._worker = None
+        # the Ponderer of each ai waiting for its opponent, and the last move
+        self._ponderers = {}
+        self._lastMove = None
 
         # ready to go - start a new game!
         self._newGame()
@@ -656,8 +1021,14 @@ class Board:
         p2 = self._strategies.get(self._strategyVars[2].get())
 
         self.clocks = {p1: self.initialTime, p2: self.initialTime}
+        self._cancelPondering()
         self._updateBoard()
 
+    def _cancelPondering(self):
+        for ponderer in self._ponderers.values():
+            ponderer.cancel()
+        self._ponderers = {}
+
     def _newGame(self):
         # delete existing pieces
         for s in self._squares.values():
@@ -666,6 +1037,8 @@ class Board:
                 s.pieceId = 0
         # create a new board state and display it
         self._state = BoardState()
+        self._lastMove = None
+        self._cancelPondering()
 
         # get the players to make it easier to reset the clocks
         p1 = self._strategies.get(self._strategyVars[1].get())
@@ -680,6 +1053,10 @@ class Board:
         if self._afterId:
             self._frame.after_cancel(self._afterId)
             self._afterId = 0
+        # abandon the search of an ai that was thinking, if any
+        if self._worker:
+            self._worker.cancel()
+            self._worker = None
         # reset any enabled spaces
         self._disableSpaces()
         # update canvas display to match current state
@@ -740,29 +1117,73 @@ class Board:
         # calls the strategy to determine next move
         if len(moves) == 1:
             # only one choice, don't both calling strategy
-            self._state = self._state.make_move(moves[0])
+            self._cancelPonderer(ai)
+            self._makeMove(moves[0])
+            self._afterId = self._frame.after(MoveDelay, self._updateBoard)
+            return
+        # self.game.calculate_utility = ai.calculate_utility
+        # update the current_player as each player considers their move
+        self.game.current_player = ai
+        self._turnStart = time.perf_counter()
+        ponderer = self._ponderers.pop(ai, None)
+        if ponderer is not None and ponderer.hit(self._lastMove):
+            # the search of the expected position is already under way
+            self._worker = ponderer.worker
+            stats = None
         else:
-            # self.game.calculate_utility = ai.calculate_utility
-            # update the current_player as each player considers their move
-            self.game.current_player = ai
-            params = ai.alphabeta_parameters(self._state, self.clocks[ai])
-            startTime = time.clock()
-            move = alphabeta_search(self._state, self.game, params[0], params[1], params[2])
-            endTime = time.clock()
-            moveTime = endTime - startTime
-            if moveTime > self.clocks[ai]:
-                print("Player", ai.name, "took too much time and loses.")
-                self._gameOver()
-                return
+            # search in a worker thread so the window stays responsive
+            stats = SearchStats()
+            self._worker = SearchWorker()
+            self._worker.start(player_search, self._state, self.game, ai,
+                               self.clocks[ai], stats, self._worker.stop)
+        self._afterId = self._frame.after(PollDelay, self._pollAi, ai, stats)
+
+    def _cancelPonderer(self, ai):
+        ponderer = self._ponderers.pop(ai, None)
+        if ponderer is not None:
+            ponderer.cancel()
+
+    def _pollAi(self, ai, stats):
+        # called every PollDelay msec while an ai is thinking
+        worker = self._worker
+        if not worker.done():
+            if stats is None:
+                progress = 'pondered'
             else:
-                self.clocks[ai] -= moveTime
-
-            # call strategy
-            # move = ai(self.game, self._state)
-            # x,y,boardstate = ai.getNextMove(self._state.getPlayer(), moves)
-            self._state = self._state.make_move(move)
+                progress = 'depth %d, %d nodes' % (
+                    len(stats.nodes_by_depth) - 1, stats.nodes)
+            self._postStatus(self.passedText + "%s (%s) is thinking: %s" %
+                             (ai.name, PlayerNames[self._state.getPlayer()],
+                              progress))
+            self._afterId = self._frame.after(PollDelay, self._pollAi, ai,
+                                              stats)
+            return
+        self._worker = None
+        if worker.error is not None:
+            raise worker.error
+        # a pondered search only uses the clock from the start of the turn
+        moveTime = min(worker.seconds, time.perf_counter() - self._turnStart)
+        if moveTime > self.clocks[ai]:
+            print("Player", ai.name, "took too much time and loses.")
+            self._gameOver()
+            return
+        else:
+            self.clocks[ai] -= moveTime
+
+        # call strategy
+        # move = ai(self.game, self._state)
+        # x,y,boardstate = ai.getNextMove(self._state.getPlayer(), moves)
+        move, stats = worker.result
+        self._makeMove(move)
+        if self.ponder and stats.pv[1:] and stats.pv[0] == move:
+            self._ponderers[ai] = Ponderer(self.game, ai, self._state,
+                                           stats.pv[1], self.clocks[ai])
         self._afterId = self._frame.after(MoveDelay, self._updateBoard)
 
+    def _makeMove(self, move):
+        self._state = self._state.make_move(move)
+        self._lastMove = move
+
     def _enableSpaces(self):
         # make spaces active where a legal move is possible (only used for human players)
         for x, y in self._enabledSpaces:
@@ -790,7 +1211,7 @@ class Board:
 
     def _selectSpace(self, x, y):
         # this is called when a human clicks on a space to place a piece
-        self._state = self._state.make_move(x * 17 + y + 18)
+        self._makeMove(x * 17 + y + 18)
         self._updateBoard()
 
     def _gameOver(self):
@@ -802,16 +1223,17 @@ class Board:
                          (PlayerNames[1], count[1], PlayerNames[2], count[2]))
 
 
-def start_graphical_othello_game(p1, p2, initialTime=1800):
+def start_graphical_othello_game(p1, p2, initialTime=1800, ponder=False):
     strategies = (p1, p2)
     game = Othello()
     p1.initialize(game.initial, initialTime, Black)
     p2.initialize(game.initial, initialTime, White)
-    board = Board(game, strategies, initialTime)
+    board = Board(game, strategies, initialTime, ponder)
     # board.initialTime = initialTime
     board.play()
 
-start_graphical_othello_game(othello_player("Bob"), othello_player("Fred"))
+if __name__ == '__main__':
+    start_graphical_othello_game(othello_player("Bob"), othello_player("Fred"))
 ## To start a graphical game type:
 ##   start_graphical_othello_game(othello_player("Bob"), othello_player("Fred"))
 ## where othello_player can be replaced by MyPlayer or whatever you choose to
@@ -0,0 +1,134 @@
+"""Lazy SMP: parallel alpha-beta search for Gomoku over a shared table
+
+Helper processes search the same position as the main search.Engine, all
+storing into one transposition.TranspositionTable in shared memory.  There
+is no other communication during a search: each process finds the cutoffs
+and best moves the others have stored, so the main search reaches a given
+depth sooner.  To spread the work, odd-numbered helpers start one ply
+deeper than the main search and every helper tries equally good moves in
+a random order of its own, reshuffled for every move of the game.  Each
+helper keeps its game and engine, and so its killer moves and history
+scores, for the life of the ParallelEngine, catching up with the moves
+played between searches.
+
+"""
+
+import os
+from multiprocessing import Event, Process, Queue
+from random import Random
+from time import perf_counter
+
+from core import Game
+from search import Engine, MAX_PLY
+from transposition import TranspositionTable, shared_buffer
+
+
+class ParallelEngine:
+    """A search.Engine for game with processes - 1 helper processes.
+
+    search() has the same interface as Engine.search.  After a search,
+    depth, score and best_move come from the deepest completed iteration of
+    any process and nodes counts the nodes of all of them.  Call close()
+    to stop the helpers."""
+
+    def __init__(self, game, processes=None, tt_size=1 << 18):
+        self.game = game
+        self.processes = processes or os.cpu_count() or 1
+        self.buffer = shared_buffer(tt_size)
+        self.engine = Engine(game, tt=TranspositionTable(tt_size, self.buffer))
+        self.stop = Event()
+        self.engine.stop = self.stop
+        self.results = Queue()
+        self.tasks = []
+        self.helpers = []
+        rules = (game.height, game.width, game.radius, game.k, game.exact)
+        for helper in range(1, self.processes):
+            tasks = Queue()
+            process = Process(target=_helper,
+                              args=(helper, rules, tt_size, self.buffer,
+                                    tasks, self.stop, self.results),
+                              daemon=True)
+            process.start()
+            self.tasks.append(tasks)
+            self.helpers.append(process)
+        self.nodes = 0
+        self.depth = 0
+        self.score = 0
+        self.best_move = None
+        self.seconds = 0.0
+
+    def search(self, time_limit=1.0, max_depth=MAX_PLY - 1):
+        """Return the best move found within time_limit seconds."""
+        game = self.game
+        start = perf_counter()
+        self.stop.clear()
+        moves = [move for move, *rest in game.history]
+        for tasks in self.tasks:
+            tasks.put((moves, time_limit, max_depth))
+
+        engine = self.engine
+        best_move = engine.search(time_limit, max_depth)
+        # The helpers stop as soon as the main search is done
+        self.stop.set()
+        self.nodes = engine.nodes
+        self.depth = engine.depth
+        self.score = engine.score
+        for helper in self.helpers:
+            nodes, depth, score, move = self.results.get()
+            self.nodes += nodes
+            if depth > self.depth and move is not None:
+                self.depth, self.score, best_move = depth, score, move
+        self.best_move = best_move
+        self.seconds = perf_counter() - start
+        return best_move
+
+    def close(self):
+        """Stop the helper processes and stop following the game."""
+        for tasks in self.tasks:
+            tasks.put(None)
+        for process in self.helpers:
+            process.join()
+        self.tasks = []
+        self.helpers = []
+        self.engine.close()
+
+    def __repr__(self):
+        return '<%s %d processes>' % (self.__class__.__name__, self.processes)
+
+
+def _helper(number, rules, tt_size, buffer, tasks, stop, results):
+    """Helper process: search each position sent on tasks until None.
+
+    rules are the (height, width, radius, k, exact) of the game.  The game
+    and engine are made once, before the first task, and brought up to
+    date with each task's moves by _follow."""
+    height, width, radius, k, exact = rules
+    game = Game(height, width, radius, k, exact)
+    engine = Engine(game, tt=TranspositionTable(tt_size, buffer))
+    engine.stop = stop
+    while True:
+        task = tasks.get()
+        if task is None:
+            engine.close()
+            return
+        moves, time_limit, max_depth = task
+        _follow(game, moves)
+        # A different order of equal moves for each helper and each move
+        engine.random = Random(number << 16 | len(moves))
+        engine.search(time_limit, max_depth, 1 + number % 2)
+        results.put((engine.nodes, engine.depth, engine.score,
+                     engine.best_move if engine.depth else None))
+
+
+def _follow(game, moves):
+    """Bring game to the position after moves, taking back the moves that
+    differ from them and playing the ones it lacks."""
+    played = [move for move, *rest in game.history]
+    common = 0
+    while (common < min(len(played), len(moves)) and
+           played[common] == moves[common]):
+        common += 1
+    for move in played[common:]:
+        game.undo_move()
+    for move in moves[common:]:
+        game.make_move(move)
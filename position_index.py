@@ -0,0 +1,197 @@
+"""Position index over a corpus of games, keyed by Zobrist hash
+
+The index is a file of fixed-size entries sorted by hash:
+
+    hash       8 bytes  core.Game.hash or othello BoardState.zobrist_hash()
+    game       4 bytes  game number in the corpus
+    move       2 bytes  number of moves played to reach the position
+    result     1 byte   records.BLACK_WON, WHITE_WON, DRAW or UNKNOWN
+    kind       1 byte   records.GOMOKU or records.OTHELLO
+
+It is built in one streaming pass: entries are collected in sorted runs of
+bounded size, written to temporary files and merged at the end.  Lookups
+binary-search the mmapped file.
+
+Games can come from a records.GameDatabase or from move-sequence files,
+which hold one game per line as space-separated row,col moves ('pass' for
+an Othello pass).
+
+"""
+
+import heapq
+import mmap
+import os
+import struct
+import tempfile
+
+from core import Game
+from records import (GOMOKU, BLACK_WON, WHITE_WON, DRAW, UNKNOWN,
+                     gomoku_record, othello_record)
+
+ENTRY = struct.Struct('<QIHBB')
+MAGIC = b'GMKPIX\x00\x01'
+
+# Entries held in memory before a sorted run is written out
+RUN_SIZE = 1 << 20
+
+
+def read_move_file(path, kind=GOMOKU, height=15, width=15):
+    """Yield a Record for each game in a move-sequence file.  The result of
+    each game is worked out by replaying it."""
+    with open(path) as f:
+        for line in f:
+            moves = []
+            for token in line.split():
+                if token == 'pass':
+                    moves.append(None)
+                else:
+                    row, col = token.split(',')
+                    moves.append((int(row), int(col)))
+            if not moves:
+                continue
+            if kind == GOMOKU:
+                game = Game(height, width)
+                for move in moves:
+                    game.make_move(move)
+                yield gomoku_record(game)
+            else:
+                from othello import BoardState
+                state = BoardState()
+                squares = [None if move is None else
+                           (move[0] + 1) * 17 + move[1] + 1 for move in moves]
+                for square in squares:
+                    state = state.make_move(square)
+                # The game is over when neither player can move
+                finished = state.game_over()
+                yield othello_record(squares, state, finished)
+
+
+def position_hashes(record):
+    """Yield (move number, hash) for each position reached in record,
+    starting with the position after the first move."""
+    if record.kind == GOMOKU:
+        game = Game(record.height, record.width)
+        for number, move in enumerate(record.coordinates(), 1):
+            game.make_move(move)
+            yield number, game.hash
+    else:
+        from othello import BoardState
+        state = BoardState()
+        for number, move in enumerate(record.coordinates(), 1):
+            state = state.make_move(None if move is None else
+                                    (move[0] + 1) * 17 + move[1] + 1)
+            yield number, state.zobrist_hash()
+
+
+def build_index(path, records, run_size=RUN_SIZE):
+    """Write the position index of records (an iterable of Records, e.g. a
+    GameDatabase) to path and return the number of entries."""
+    directory = os.path.dirname(os.path.abspath(path))
+    runs = []
+    entries = []
+    try:
+        for game, record in enumerate(records):
+            for number, key in position_hashes(record):
+                entries.append((key, game, number, record.result, record.kind))
+            if len(entries) >= run_size:
+                runs.append(_write_run(entries, directory))
+                entries = []
+        entries.sort()
+
+        count = 0
+        with open(path, 'wb') as out:
+            out.write(MAGIC)
+            for entry in heapq.merge(entries, *(_read_run(run) for run in runs)):
+                out.write(ENTRY.pack(*entry))
+                count += 1
+        return count
+    finally:
+        for run in runs:
+            os.remove(run)
+
+
+def _write_run(entries, directory):
+    entries.sort()
+    fd, run = tempfile.mkstemp(suffix='.run', dir=directory)
+    with os.fdopen(fd, 'wb') as f:
+        for entry in entries:
+            f.write(ENTRY.pack(*entry))
+    return run
+
+
+def _read_run(run):
+    with open(run, 'rb') as f:
+        while True:
+            data = f.read(ENTRY.size * 4096)
+            if not data:
+                return
+            yield from ENTRY.iter_unpack(data)
+
+
+class PositionIndex:
+    """Read-only view of an index file written by build_index."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError("%s is not a position index" % path)
+        self._count = (len(self._map) - len(MAGIC)) // ENTRY.size
+
+    def __len__(self):
+        return self._count
+
+    def _key(self, i):
+        return struct.unpack_from('<Q', self._map, len(MAGIC) + i * ENTRY.size)[0]
+
+    def lookup(self, key):
+        """Return (game, move number, result, kind) for every time a game
+        reached the position with hash key."""
+        # Binary search for the first entry with this hash
+        low, high = 0, self._count
+        while low < high:
+            mid = (low + high) // 2
+            if self._key(mid) < key:
+                low = mid + 1
+            else:
+                high = mid
+        found = []
+        offset = len(MAGIC) + low * ENTRY.size
+        while low < self._count:
+            entry = ENTRY.unpack_from(self._map, offset)
+            if entry[0] != key:
+                break
+            found.append(entry[1:])
+            low += 1
+            offset += ENTRY.size
+        return found
+
+    def games(self, key):
+        """Return the numbers of the games that reached the position."""
+        return sorted(set(entry[0] for entry in self.lookup(key)))
+
+    def outcomes(self, key):
+        """Return how the games through the position ended, as a dict of
+        result: number of games."""
+        results = {BLACK_WON: 0, WHITE_WON: 0, DRAW: 0, UNKNOWN: 0}
+        seen = set()
+        for game, number, result, kind in self.lookup(key):
+            if game not in seen:
+                seen.add(game)
+                results[result] += 1
+        return results
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __repr__(self):
+        return '<%s %s %d entries>' % (self.__class__.__name__, self.path,
+                                       self._count)
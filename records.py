@@ -0,0 +1,233 @@
+"""Compact binary game records and a memory-mapped game database
+
+A record is an 8-byte header followed by one byte per move:
+
+    kind       1 byte   GOMOKU or OTHELLO
+    height     1 byte
+    width      1 byte
+    result     1 byte   BLACK_WON, WHITE_WON, DRAW or UNKNOWN
+    score      2 bytes  signed; black discs minus white discs for Othello
+    num_moves  2 bytes
+    moves      num_moves bytes, row * width + col, or PASS
+
+A GameDatabase is an append-only file of records next to an index file of
+8-byte record offsets.  Both are opened with mmap, so any game can be read
+by number without parsing the ones before it.
+
+"""
+
+import mmap
+import os
+import struct
+from array import array
+
+from core import Game, Piece
+
+GOMOKU = 0
+OTHELLO = 1
+
+BLACK_WON = 0
+WHITE_WON = 1
+DRAW = 2
+UNKNOWN = 3
+
+PASS = 255
+
+HEADER = struct.Struct('<BBBBhH')
+MAGIC = b'GMKDB\x00\x00\x01'
+
+
+class Record:
+    """One finished (or abandoned) game.  moves holds cell numbers
+    row * width + col, with None for a pass."""
+
+    def __init__(self, kind, height, width, moves, result=UNKNOWN, score=0):
+        if height * width > PASS:
+            raise ValueError("board too big for one byte per move: %dx%d"
+                             % (height, width))
+        self.kind = kind
+        self.height = height
+        self.width = width
+        self.moves = moves
+        self.result = result
+        self.score = score
+
+    def to_bytes(self):
+        return (HEADER.pack(self.kind, self.height, self.width, self.result,
+                            self.score, len(self.moves)) +
+                bytes(PASS if move is None else move for move in self.moves))
+
+    @classmethod
+    def from_bytes(cls, data, offset=0):
+        """Decode the record that starts at offset in data."""
+        kind, height, width, result, score, count = HEADER.unpack_from(data,
+                                                                        offset)
+        start = offset + HEADER.size
+        moves = [None if move == PASS else move
+                 for move in data[start:start + count]]
+        return cls(kind, height, width, moves, result, score)
+
+    def __len__(self):
+        """Size of the encoded record in bytes."""
+        return HEADER.size + len(self.moves)
+
+    def coordinates(self):
+        """Return the moves as (row, col) pairs, None for a pass."""
+        return [None if move is None else divmod(move, self.width)
+                for move in self.moves]
+
+    def replay(self):
+        """Return the final position: a core.Game for Gomoku or an
+        othello.BoardState for Othello."""
+        if self.kind == GOMOKU:
+            game = Game(self.height, self.width)
+            for move in self.coordinates():
+                game.make_move(move)
+            return game
+        from othello import BoardState
+        state = BoardState()
+        for move in self.coordinates():
+            state = state.make_move(None if move is None else
+                                    (move[0] + 1) * 17 + move[1] + 1)
+        return state
+
+    def __repr__(self):
+        return '<%s %s %d moves>' % (self.__class__.__name__,
+                                     ('gomoku', 'othello')[self.kind],
+                                     len(self.moves))
+
+
+def gomoku_record(game):
+    """Return the Record of the moves played so far in a core.Game."""
+    moves = [row * game.width + col
+             for (row, col), *rest in game.history]
+    if game.has_won():
+        result = (BLACK_WON if game.cells[game.last_move[0]][game.last_move[1]]
+                  == Piece.BLACK else WHITE_WON)
+    elif game.num_moves == game.height * game.width or game.is_dead_draw():
+        result = DRAW
+    else:
+        result = UNKNOWN
+    return Record(GOMOKU, game.height, game.width, moves, result)
+
+
+def othello_record(moves, state, finished=True):
+    """Return the Record of an Othello game.  moves are the BoardState
+    squares played (None for a pass) and state is the final BoardState."""
+    from othello import Black, White
+    score = state._board.count(Black) - state._board.count(White)
+    if not finished:
+        result = UNKNOWN
+    elif score > 0:
+        result = BLACK_WON
+    elif score < 0:
+        result = WHITE_WON
+    else:
+        result = DRAW
+    return Record(OTHELLO, 15, 15,
+                  [None if move is None else
+                   (move // 17 - 1) * 15 + move % 17 - 1 for move in moves],
+                  result, score)
+
+
+class GameDatabase:
+    """An append-only file of records, with an index of their offsets in
+    path + '.idx'.  Records are numbered from 0 in the order appended."""
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + '.idx'
+        if not os.path.exists(path):
+            with open(path, 'wb') as f:
+                f.write(MAGIC)
+            open(self.index_path, 'wb').close()
+        elif not os.path.exists(self.index_path):
+            self.reindex()
+        self._data = open(path, 'ab')
+        self._index = open(self.index_path, 'ab')
+        self._map = self._index_map = None
+        self._offsets = None
+        self._size = os.path.getsize(path)
+        self._count = os.path.getsize(self.index_path) // 8
+
+    def append(self, record):
+        """Add record to the end of the database and return its number."""
+        self._index.write(struct.pack('<Q', self._size))
+        self._data.write(record.to_bytes())
+        self._size += len(record)
+        self._count += 1
+        self._unmap()
+        return self._count - 1
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def flush(self):
+        self._data.flush()
+        self._index.flush()
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, number):
+        if number < 0:
+            number += len(self)
+        if not 0 <= number < len(self):
+            raise IndexError("no game %d in %s" % (number, self.path))
+        if self._map is None:
+            self._mmap()
+        return Record.from_bytes(self._map, self._offsets[number])
+
+    def __iter__(self):
+        for number in range(len(self)):
+            yield self[number]
+
+    def _mmap(self):
+        self.flush()
+        with open(self.path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self):
+            with open(self.index_path, 'rb') as f:
+                self._index_map = mmap.mmap(f.fileno(), 0,
+                                            access=mmap.ACCESS_READ)
+            self._offsets = memoryview(self._index_map).cast('Q')
+        else:
+            self._offsets = ()
+
+    def _unmap(self):
+        if self._map is not None:
+            if self._index_map is not None:
+                self._offsets.release()
+                self._index_map.close()
+            self._map.close()
+            self._map = self._index_map = None
+            self._offsets = None
+
+    def reindex(self):
+        """Rebuild the index file by walking the records."""
+        offsets = array('Q')
+        with open(self.path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if data[:len(MAGIC)] != MAGIC:
+                    raise ValueError("%s is not a game database" % self.path)
+                offset = len(MAGIC)
+                while offset < len(data):
+                    offsets.append(offset)
+                    offset += HEADER.size + HEADER.unpack_from(data, offset)[-1]
+        with open(self.index_path, 'wb') as f:
+            offsets.tofile(f)
+
+    def close(self):
+        self._unmap()
+        self._data.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __repr__(self):
+        return '<%s %s>' % (self.__class__.__name__, self.path)
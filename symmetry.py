@@ -0,0 +1,155 @@
+"""Board symmetries and canonical positions
+
+A square board has 8 symmetries (the rotations and reflections of the
+square), any other rectangle 4.  A transform is numbered by its place in
+transforms(height, width) and stored as a table mapping each cell number
+row * width + col to the cell it moves to; transform 0 is the identity.
+
+The canonical form of a position is its image with the smallest Zobrist
+hash, so the 8 symmetric copies of a position share one hash and can share
+one entry in a transposition table, opening book or training set.  Moves
+found in the canonical form are mapped back with unmap_move.
+
+"""
+
+from core import Game, zobrist_keys
+
+_transform_tables = {}
+_inverse_tables = {}
+
+
+def transforms(height, width):
+    """Return the transform tables of a height x width board."""
+    key = (height, width)
+    if key not in _transform_tables:
+        maps = [lambda r, c: (r, c),
+                lambda r, c: (r, width - 1 - c),
+                lambda r, c: (height - 1 - r, c),
+                lambda r, c: (height - 1 - r, width - 1 - c)]
+        if height == width:
+            maps += [lambda r, c: (c, r),
+                     lambda r, c: (c, height - 1 - r),
+                     lambda r, c: (width - 1 - c, r),
+                     lambda r, c: (width - 1 - c, height - 1 - r)]
+        tables = []
+        for transform in maps:
+            table = []
+            for cell in range(height * width):
+                r, c = transform(*divmod(cell, width))
+                table.append(r * width + c)
+            tables.append(table)
+        _transform_tables[key] = tables
+    return _transform_tables[key]
+
+
+def inverses(height, width):
+    """Return the tables undoing each transform of transforms()."""
+    key = (height, width)
+    if key not in _inverse_tables:
+        inverse_tables = []
+        for table in transforms(height, width):
+            inverse = [0] * len(table)
+            for cell, image in enumerate(table):
+                inverse[image] = cell
+            inverse_tables.append(inverse)
+        _inverse_tables[key] = inverse_tables
+    return _inverse_tables[key]
+
+
+def symmetric_hashes(height, width, moves):
+    """Return the core.Game hash of the position reached by moves (cell
+    numbers, black first) under each transform."""
+    keys = zobrist_keys(height, width)
+    tables = transforms(height, width)
+    hashes = [0] * len(tables)
+    for number, cell in enumerate(moves):
+        colour_keys = keys[number % 2]
+        for t, table in enumerate(tables):
+            hashes[t] ^= colour_keys[table[cell]]
+    return hashes
+
+
+def map_move(move, transform, height, width):
+    """Return the (row, col) move seen through transform."""
+    cell = transforms(height, width)[transform][move[0] * width + move[1]]
+    return divmod(cell, width)
+
+
+def unmap_move(move, transform, height, width):
+    """Return the move on the real board for a (row, col) move found in the
+    image under transform."""
+    cell = inverses(height, width)[transform][move[0] * width + move[1]]
+    return divmod(cell, width)
+
+
+def canonical_game(game):
+    """Return (form, hash, transform) for a core.Game or BitboardGame: the
+    canonical image as a new core.Game with the same moves, its hash, and
+    the transform that maps the position onto it."""
+    height, width = game.height, game.width
+    moves = [row * width + col for (row, col), *rest in game.history]
+    hashes = symmetric_hashes(height, width, moves)
+    key = min(hashes)
+    transform = hashes.index(key)
+    table = transforms(height, width)[transform]
+    form = Game(height, width, game.radius, game.k, game.exact)
+    for cell in moves:
+        form.make_move(divmod(table[cell], width))
+    return form, key, transform
+
+
+# Othello squares are numbered (row + 1) * 17 + col + 1 on a 15 x 15 board
+
+def _square_cell(square):
+    return (square // 17 - 1) * 15 + square % 17 - 1
+
+
+def _cell_square(cell):
+    row, col = divmod(cell, 15)
+    return (row + 1) * 17 + col + 1
+
+
+def map_square(square, transform):
+    """Return the Othello square seen through transform (None for a pass)."""
+    if square is None:
+        return None
+    return _cell_square(transforms(15, 15)[transform][_square_cell(square)])
+
+
+def unmap_square(square, transform):
+    """Return the Othello square on the real board for a square found in the
+    image under transform."""
+    if square is None:
+        return None
+    return _cell_square(inverses(15, 15)[transform][_square_cell(square)])
+
+
+def canonical_state(state):
+    """Return (form, hash, transform) for an othello.BoardState: the
+    canonical image as a new BoardState, its zobrist_hash() and the
+    transform that maps the position onto it."""
+    from othello import (BoardState, Empty, White, Zobrist_Keys,
+                         Zobrist_White_To_Move)
+    board = state._board
+    stones = [(cell, board[_cell_square(cell)]) for cell in range(225)
+              if board[_cell_square(cell)] != Empty]
+    side = Zobrist_White_To_Move if state.to_move == White else 0
+    best = None
+    for transform, table in enumerate(transforms(15, 15)):
+        h = side
+        for cell, player in stones:
+            h ^= Zobrist_Keys[player][_cell_square(table[cell])]
+        if best is None or h < best[0]:
+            best = (h, transform)
+    key, transform = best
+    table = transforms(15, 15)[transform]
+    image = list(board)
+    for cell in range(225):
+        image[_cell_square(cell)] = Empty
+    for cell, player in stones:
+        image[_cell_square(table[cell])] = player
+    moves = state.legal_moves()
+    if moves != [None]:
+        moves = sorted(map_square(square, transform) for square in moves)
+    form = BoardState(state.to_move, state._utility, image, moves)
+    return form, key, transform
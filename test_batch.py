@@ -0,0 +1,39 @@
+"""Tests for the batch self-play simulator
+
+    python -m pytest test_batch.py
+
+"""
+
+import unittest
+
+from batch import BatchSimulator
+from core import Game
+
+
+class BatchSimulatorTest(unittest.TestCase):
+
+    def check_records(self, size, radius=None, **rules):
+        """Replay batch games in core.Game and check that each ends on the
+        first winning move, won by the same side."""
+        simulator = BatchSimulator(32, size, size, radius, seed=1, **rules)
+        for moves, winner in simulator.run(100):
+            game = Game(size, size, **rules)
+            for move in moves[:-1]:
+                self.assertFalse(game.is_winning_move(move))
+                game.make_move(move)
+            last = moves[-1]
+            expected = game.to_move() if game.is_winning_move(last) else None
+            self.assertEqual(winner, expected)
+
+    def test_exact_five(self):
+        self.check_records(9)
+
+    def test_overlines(self):
+        self.check_records(9, k=5, exact=False)
+
+    def test_four_in_a_row(self):
+        self.check_records(7, radius=1, k=4)
+
+
+if __name__ == '__main__':
+    unittest.main()
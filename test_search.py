@@ -0,0 +1,58 @@
+"""Tests for the alpha-beta engine
+
+    python -m pytest test_search.py
+
+"""
+
+import unittest
+
+from core import Game
+from search import Engine, WIN_SCORE, WIN_THRESHOLD
+
+
+def play(moves, size=15, **rules):
+    """Return a size x size game after moves, alternating from black."""
+    game = Game(size, size, radius=2, **rules)
+    for move in moves:
+        game.make_move(move)
+    return game
+
+
+class EngineTest(unittest.TestCase):
+
+    def search(self, game, depth):
+        engine = Engine(game)
+        try:
+            move = engine.search(time_limit=float('inf'), max_depth=depth)
+            return move, engine.score
+        finally:
+            engine.close()
+
+    def test_takes_a_win(self):
+        game = play([(7, 3), (0, 0), (7, 4), (0, 14), (7, 5), (14, 0),
+                     (7, 6), (14, 14)])
+        move, score = self.search(game, 3)
+        self.assertIn(move, [(7, 2), (7, 7)])
+        self.assertEqual(score, WIN_SCORE - 1)
+
+    def test_caps_a_four_closed_at_one_end(self):
+        # O X X X X _ _ on row 3, and an open three of X on column 6 through
+        # the second empty cell.  Blocking the five on (3, 5) lets X make an
+        # open four on column 6, but O on (3, 6) closes the five at both
+        # ends and caps the three as well.
+        game = play([(4, 6), (3, 0), (5, 6), (14, 14), (6, 6), (14, 12),
+                     (3, 1), (14, 10), (3, 2), (12, 14), (3, 3), (10, 14),
+                     (3, 4)])
+        move, score = self.search(game, 4)
+        self.assertEqual(move, (3, 6))
+        self.assertGreater(score, -WIN_THRESHOLD)
+
+    def test_follows_the_win_length(self):
+        game = play([(7, 6), (0, 0), (7, 7), (0, 14)], k=4)
+        move, score = self.search(game, 3)
+        self.assertIn(move, [(7, 5), (7, 8)])
+        self.assertGreaterEqual(score, WIN_THRESHOLD)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+"""Tests for the threat-space solver
+
+    python -m pytest test_threats.py
+
+"""
+
+import unittest
+
+from core import Game, Piece
+from threats import ThreatSolver, stopping_cells, vcf
+
+
+def play(moves, size=9, **rules):
+    """Return a size x size game after moves, alternating from black."""
+    game = Game(size, size, radius=2, **rules)
+    for move in moves:
+        game.make_move(move)
+    return game
+
+
+class StoppingCellsTest(unittest.TestCase):
+
+    def test_four_closed_at_one_end_can_be_capped(self):
+        # O X X X X _ _ on row 3: X wins on (3, 5), but O on (3, 6) would
+        # close the five at both ends
+        game = play([(3, 1), (3, 0), (3, 2), (8, 8), (3, 3), (8, 6), (3, 4)])
+        self.assertTrue(game.is_winning_move((3, 5), Piece.BLACK))
+        self.assertEqual(stopping_cells(game, Piece.BLACK, [(3, 5)]),
+                         [(3, 5), (3, 6)])
+
+    def test_open_four_is_only_stopped_on_its_cells(self):
+        game = play([(3, 1), (8, 0), (3, 2), (8, 8), (3, 3), (8, 6), (3, 4)])
+        self.assertEqual(stopping_cells(game, Piece.BLACK, [(3, 0), (3, 5)]),
+                         [(3, 0), (3, 5)])
+
+
+class SolverTest(unittest.TestCase):
+
+    def test_vcf_from_open_three(self):
+        game = play([(7, 5), (0, 0), (7, 6), (0, 14), (7, 7), (14, 0)],
+                    size=15)
+        line = vcf(game)
+        self.assertIsNotNone(line)
+        for move in line:
+            game.make_move(move)
+        self.assertTrue(game.has_won())
+
+    def test_capped_four_is_not_a_forced_win(self):
+        # Black's four (5, 3) on row 5 is closed by white on (5, 0), so white
+        # can answer it on (5, 6) as well as on (5, 4); the line that
+        # assumed (5, 4) was forced does not win, and there is no VCF
+        game = play([(4, 3), (3, 2), (5, 5), (7, 4), (2, 5), (5, 0), (3, 3),
+                     (0, 4), (0, 5), (7, 6), (0, 7), (3, 4), (5, 1), (6, 8),
+                     (5, 2), (8, 8), (5, 7), (4, 5), (2, 8), (1, 2), (7, 0),
+                     (7, 8)])
+        solver = ThreatSolver(5000)
+        self.assertIsNone(solver.vcf(game))
+        self.assertFalse(solver.exhausted)
+
+
+if __name__ == '__main__':
+    unittest.main()
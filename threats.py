@@ -0,0 +1,333 @@
+"""Threat-space search for Gomoku, built on core.Game
+
+A VCF (victory by continuous fours) plays only fours, so every reply of the
+defender is forced.  A VCT (victory by continuous threats) also plays threes,
+which the defender can answer on the line of the three or with a four of
+their own.  Both searches only look at these forcing moves, which is far
+cheaper than a full-width search.
+
+Fives, fours and threes are counted in windows of game.k cells, so they
+stand for k, k - 1 and k - 2 stones in a row under the game's rules.
+
+"""
+
+import core
+from core import Piece, DIRECTIONS
+
+_window_tables = {}
+
+
+def window_table(height, width, k):
+    """Return (windows, cell_windows) for a height x width board.
+
+    windows lists every run of k cells in a row, column or diagonal (see
+    core.window_table) and cell_windows maps each cell to the windows that
+    contain it."""
+    key = (height, width, k)
+    if key not in _window_tables:
+        windows, numbers = core.window_table(height, width, k)
+        cell_windows = {(row, col): [windows[number] for number in
+                                     numbers[row * width + col]]
+                        for row in range(height) for col in range(width)}
+        _window_tables[key] = (windows, cell_windows)
+    return _window_tables[key]
+
+
+def opponent(piece):
+    """Return the piece of the other player."""
+    return Piece.WHITE if piece == Piece.BLACK else Piece.BLACK
+
+
+def _count(cells, window, piece):
+    """Return the number of stones of piece in window and its empty cells,
+    or (-1, None) if the other player has a stone there."""
+    own = 0
+    empty = []
+    for row, col in window:
+        cell = cells[row][col]
+        if cell is piece:
+            own += 1
+        elif cell is Piece.EMPTY:
+            empty.append((row, col))
+        else:
+            return -1, None
+    return own, empty
+
+
+def scan(game):
+    """Return {piece: {n: cells}} where cells are the empty cells of the
+    windows holding n stones of piece and none of the opponent, for n from
+    k - 3 (but at least 1) to k - 1.
+
+    The stone counts come from game.window_counts, so only the windows of
+    interest are looked at.  A window full of one colour that did not end
+    the game (a five blocked at both ends, or part of an overline under
+    the exact rule) has no empty cells and is skipped."""
+    cells = game.cells
+    k = game.k
+    levels = range(max(1, k - 3), k)
+    result = {Piece.BLACK: {n: set() for n in levels},
+              Piece.WHITE: {n: set() for n in levels}}
+    black_counts, white_counts = game.window_counts
+    for window, black, white in zip(game.windows, black_counts,
+                                    white_counts):
+        if white == 0 and black in levels:
+            stones = result[Piece.BLACK][black]
+        elif black == 0 and white in levels:
+            stones = result[Piece.WHITE][white]
+        else:
+            continue
+        stones.update((row, col) for row, col in window
+                      if cells[row][col] is Piece.EMPTY)
+    return result
+
+
+def winning_cells(game, piece, candidates):
+    """Return the cells of candidates where piece would win at once."""
+    return sorted(cell for cell in candidates
+                  if game.is_winning_move(cell, piece))
+
+
+def stopping_cells(game, piece, wins):
+    """Return the cells where the opponent can stop piece from winning on
+    any of the cells wins: the cells themselves and, when the chain a win
+    would complete is already closed by the opponent at one end, the empty
+    cell past its other end, since a chain closed at both ends does not
+    win."""
+    cells = game.cells
+    other = opponent(piece)
+    stops = set(wins)
+    for row, col in wins:
+        for dr, dc in DIRECTIONS:
+            length = 1
+            ends = []
+            for sign in (1, -1):
+                r, c = row + sign * dr, col + sign * dc
+                while game.is_legal_position(r, c) and cells[r][c] is piece:
+                    length += 1
+                    r, c = r + sign * dr, c + sign * dc
+                ends.append((cells[r][c] if game.is_legal_position(r, c)
+                             else None, (r, c)))
+            if length < game.k or (game.exact and length != game.k):
+                continue
+            (first, first_cell), (second, second_cell) = ends
+            if first is other and second is Piece.EMPTY:
+                stops.add(second_cell)
+            elif second is other and first is Piece.EMPTY:
+                stops.add(first_cell)
+    return sorted(stops)
+
+
+def _new_wins(game, piece, move):
+    """Return the cells where piece would win thanks to its stone on move."""
+    cells = game.cells
+    windows, cell_windows = window_table(game.height, game.width, game.k)
+    candidates = set()
+    for window in cell_windows[move]:
+        own, empty = _count(cells, window, piece)
+        if own == game.k - 1:
+            candidates.update(empty)
+    return winning_cells(game, piece, candidates)
+
+
+def _makes_open_four(game, piece, move):
+    """Return True if piece, having just played move, can make a four with
+    two distinct winning cells on the next move."""
+    cells = game.cells
+    k = game.k
+    windows, cell_windows = window_table(game.height, game.width, k)
+    for window in cell_windows[move]:
+        own, empty = _count(cells, window, piece)
+        if own != k - 2:
+            continue
+        for follow in empty:
+            wins = set()
+            for other in cell_windows[follow]:
+                own, rest = _count(cells, other, piece)
+                if own == k - 2 and len(rest) == 2:
+                    wins.update(cell for cell in rest if cell != follow)
+            if len(wins) >= 2:
+                return True
+    return False
+
+
+def four_moves(game, candidates):
+    """Return the moves of candidates that make a four for the player to
+    move, as (move, winning cells) pairs."""
+    piece = game.to_move()
+    fours = []
+    for move in sorted(candidates):
+        game.make_move(move)
+        try:
+            wins = _new_wins(game, piece, move)
+        finally:
+            game.undo_move()
+        if wins:
+            fours.append((move, wins))
+    return fours
+
+
+def three_moves(game, candidates):
+    """Return the moves of candidates that make a three for the player to
+    move, i.e. that threaten an open four on the next move."""
+    piece = game.to_move()
+    threes = []
+    for move in sorted(candidates):
+        game.make_move(move)
+        try:
+            if _makes_open_four(game, piece, move):
+                threes.append(move)
+        finally:
+            game.undo_move()
+    return threes
+
+
+class BudgetExceeded(Exception):
+    """Raised inside the solver when it runs out of nodes."""
+
+
+class ThreatSolver:
+    """Search forcing moves for a win of the player to move.
+
+    vcf and vct return the winning line (attacker and defender moves
+    alternating, ending with the winning move) or None.  After a call, nodes
+    is the number of positions visited and exhausted is True if the search
+    gave up because it hit max_nodes, in which case None means 'unknown'
+    rather than 'no forced win'.  max_depth limits the number of attacking
+    moves in a line."""
+
+    def __init__(self, max_nodes=20000, max_depth=10):
+        self.max_nodes = max_nodes
+        self.max_depth = max_depth
+        self.nodes = 0
+        self.exhausted = False
+
+    def vcf(self, game):
+        """Search for a victory by continuous fours."""
+        return self.solve(game, False)
+
+    def vct(self, game):
+        """Search for a victory by continuous threes and fours."""
+        return self.solve(game, True)
+
+    def solve(self, game, threes):
+        self.threes = threes
+        self.nodes = 0
+        self.exhausted = False
+        # hash -> depth at which the attack is known to fail
+        self.failed = {}
+        try:
+            # Deepen gradually so short wins are found before long lines
+            # of threes eat the budget
+            for depth in range(1, self.max_depth + 1):
+                line = self._attack(game, depth)
+                if line is not None:
+                    return line
+        except BudgetExceeded:
+            self.exhausted = True
+        return None
+
+    def _visit(self):
+        self.nodes += 1
+        if self.nodes > self.max_nodes:
+            raise BudgetExceeded()
+
+    def _attack(self, game, depth):
+        """Return a winning line for the player to move, or None."""
+        self._visit()
+        me = game.to_move()
+        other = opponent(me)
+        k = game.k
+        cells = scan(game)
+        wins = winning_cells(game, me, cells[me][k - 1])
+        if wins:
+            return [wins[0]]
+        if depth <= 0 or self.failed.get(game.hash, -1) >= depth:
+            return None
+
+        threats = winning_cells(game, other, cells[other][k - 1])
+
+        moves = [(move, True) for move, wins in
+                 four_moves(game, cells[me].get(k - 2, ()))]
+        if self.threes:
+            fours = set(move for move, four in moves)
+            moves += [(move, False) for move in
+                      three_moves(game, cells[me].get(k - 3, set()) - fours)]
+        if threats:
+            # We have to block, so only a block that is a threat will do.
+            # _defend finds out if the block does not stop every threat.
+            stops = stopping_cells(game, other, threats)
+            moves = [(move, four) for move, four in moves if move in stops]
+
+        for move, four in moves:
+            game.make_move(move)
+            try:
+                line = self._defend(game, depth - 1, four)
+            finally:
+                game.undo_move()
+            if line is not None:
+                return [move] + line
+        self.failed[game.hash] = depth
+        return None
+
+    def _defend(self, game, depth, four):
+        """Return the longest winning line of the attacker against every
+        defence of the player to move, or None if some defence holds."""
+        self._visit()
+        me = game.to_move()
+        attacker = opponent(me)
+        k = game.k
+        cells = scan(game)
+        if winning_cells(game, me, cells[me][k - 1]):
+            return None
+
+        defences = stopping_cells(game, attacker, winning_cells(
+            game, attacker, cells[attacker][k - 1]))
+        if not defences:
+            if four:
+                return None
+            # Answer the three on its lines, or counter with a four
+            defences = set(move for move, wins in
+                           four_moves(game, cells[me].get(k - 2, ())))
+            defences.update(self._lines(game, game.last_move))
+            defences = sorted(defences)
+
+        best = None
+        for move in defences:
+            game.make_move(move)
+            try:
+                line = self._attack(game, depth)
+            finally:
+                game.undo_move()
+            if line is None:
+                return None
+            if best is None or len(line) >= len(best):
+                best = [move] + line
+        return best
+
+    def _lines(self, game, move):
+        """Return the empty cells on the lines of move that are near enough
+        to stop a three: within k cells."""
+        cells = game.cells
+        (row, col) = move
+        result = []
+        for dr, dc in DIRECTIONS:
+            for sign in (1, -1):
+                for step in range(1, game.k + 1):
+                    r = row + sign * step * dr
+                    c = col + sign * step * dc
+                    if not game.is_legal_position(r, c):
+                        break
+                    if cells[r][c] is Piece.EMPTY:
+                        result.append((r, c))
+        return result
+
+
+def vcf(game, max_nodes=20000):
+    """Return a VCF winning line for the player to move, or None."""
+    return ThreatSolver(max_nodes).vcf(game)
+
+
+def vct(game, max_nodes=20000):
+    """Return a VCT winning line for the player to move, or None."""
+    return ThreatSolver(max_nodes).vct(game)
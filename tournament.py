@@ -0,0 +1,115 @@
+"""Headless Gomoku matches between two core.Player strategies
+
+Unlike play_gomoku, games are played without printing the board or
+sleeping between moves, and are spread over a pool of worker processes.
+Colours alternate: player A has black in the even-numbered games.
+
+To run a match from the command line:
+    python tournament.py --games 100 --a alphabeta --b random --time 0.1
+
+"""
+
+import argparse
+import os
+from multiprocessing import Pool
+from time import perf_counter
+
+from core import Game, Player
+
+
+def play_game(black, white, height=15, width=15, radius=2):
+    """Play one game to the end and return the finished core.Game.  A game
+    is stopped as a draw as soon as neither side can win."""
+    game = Game(height, width, radius)
+    players = (black, white)
+    while True:
+        player = players[game.num_moves % 2]
+        game.make_move(player.search(game))
+        if game.terminal_test():
+            return game
+
+
+def play_match(black, white, height=15, width=15, radius=2):
+    """Play one game and return (winner, moves) where winner is 0 if black
+    won, 1 if white won and None for a draw."""
+    game = play_game(black, white, height, width, radius)
+    if game.has_won():
+        return (game.num_moves - 1) % 2, game.num_moves
+    return None, game.num_moves
+
+
+def _play_game(args):
+    """Pool worker: play game number index and return its result along with
+    the worker's pid and the time it took."""
+    index, player_a, player_b, height, width, radius = args
+    if index % 2 == 0:
+        black, white = player_a, player_b
+    else:
+        black, white = player_b, player_a
+    start = perf_counter()
+    winner, moves = play_match(black, white, height, width, radius)
+    elapsed = perf_counter() - start
+    # Report the result from player A's point of view
+    if winner is None:
+        result = 'draw'
+    elif (winner == 0) == (index % 2 == 0):
+        result = 'win'
+    else:
+        result = 'loss'
+    return index, result, moves, os.getpid(), elapsed
+
+
+def run_tournament(player_a, player_b, games=100, processes=None,
+                   height=15, width=15, radius=2):
+    """Play games games between player_a and player_b and return a dict of
+    results from player A's point of view: wins, draws, losses, the average
+    game length and the moves per second of each worker process."""
+    tasks = [(index, player_a, player_b, height, width, radius)
+             for index in range(games)]
+    totals = {'win': 0, 'draw': 0, 'loss': 0}
+    moves = 0
+    workers = {}
+    start = perf_counter()
+    with Pool(processes) as pool:
+        for index, result, length, pid, elapsed in pool.imap_unordered(
+                _play_game, tasks):
+            totals[result] += 1
+            moves += length
+            worker_moves, worker_time = workers.get(pid, (0, 0.0))
+            workers[pid] = (worker_moves + length, worker_time + elapsed)
+    return {'games': games,
+            'wins': totals['win'],
+            'draws': totals['draw'],
+            'losses': totals['loss'],
+            'average_length': moves / games if games else 0.0,
+            'seconds': perf_counter() - start,
+            'moves_per_second': {pid: worker_moves / worker_time
+                                 for pid, (worker_moves, worker_time)
+                                 in workers.items() if worker_time}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--a', default='alphabeta', help='strategy of player A')
+    parser.add_argument('--b', default='random', help='strategy of player B')
+    parser.add_argument('--time', type=float, default=0.1,
+                        help='seconds per move for the engines')
+    parser.add_argument('--size', type=int, default=15)
+    parser.add_argument('--radius', type=int, default=2)
+    args = parser.parse_args()
+
+    results = run_tournament(Player(args.a, args.time), Player(args.b, args.time),
+                             args.games, args.processes, args.size, args.size,
+                             args.radius)
+    print("%s vs %s: %d wins, %d draws, %d losses" %
+          (args.a, args.b, results['wins'], results['draws'], results['losses']))
+    print("Average game length: %.1f moves" % results['average_length'])
+    print("Wall clock: %.1f seconds" % results['seconds'])
+    for pid, rate in sorted(results['moves_per_second'].items()):
+        print("  worker %d: %.1f moves/second" % (pid, rate))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Fixed-size transposition table keyed by Zobrist hashes.
+
+A table can live in a shared buffer (see shared_buffer) so that several
+search processes use it at once without locks.  Each slot stores its key
+xored with its data word, so a slot torn by two processes writing at the
+same time fails the key check on probe instead of returning a wrong entry.
+
+"""
+
+import ctypes
+from array import array
+from multiprocessing import RawArray
+
+# Bound types stored with each entry
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+NO_MOVE = 0xFFFF
+
+# Layout of the packed 64-bit data word:
+#   bits  0-15  best move (NO_MOVE if none)
+#   bits 16-23  depth
+#   bits 24-25  bound type
+#   bit  26     set when the slot is in use
+#   bits 32-63  score + SCORE_OFFSET
+USED = 1 << 26
+SCORE_OFFSET = 1 << 31
+
+
+def _buckets(size):
+    buckets = 1
+    while buckets * 2 <= size:
+        buckets *= 2
+    return buckets
+
+
+def shared_buffer(size=1 << 16):
+    """Return zeroed shared memory for a TranspositionTable of the given
+    size, which can be passed to other processes when they are started."""
+    return RawArray(ctypes.c_uint64, 4 * _buckets(size))
+
+
+class TranspositionTable:
+    """A table of 2 * size entries split into size buckets of two slots.
+
+    The first slot of a bucket is depth-preferred: it is only overwritten by
+    the same position or by a search at least as deep.  The second slot is
+    always replaced, so recent positions are kept even when the first slot
+    holds a deeper result.  Moves are ints (e.g. row * width + col) and
+    scores must fit in 32 bits.  size is rounded down to a power of two.
+
+    buffer, if given, is the memory to keep the table in, as returned by
+    shared_buffer(size); otherwise the table has memory of its own."""
+
+    def __init__(self, size=1 << 16, buffer=None):
+        buckets = _buckets(size)
+        self.mask = buckets - 1
+        if buffer is None:
+            self.keys = array('Q', bytes(16 * buckets))
+            self.data = array('Q', bytes(16 * buckets))
+        else:
+            words = memoryview(buffer).cast('B').cast('Q')
+            if len(words) != 4 * buckets:
+                raise ValueError("buffer does not fit a table of size %d"
+                                 % size)
+            self.keys = words[:2 * buckets]
+            self.data = words[2 * buckets:]
+        self.buffer = buffer
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def probe(self, key):
+        """Return (depth, bound, score, move) stored for key, or None.
+        move is None if no best move was stored."""
+        self.probes += 1
+        slot = (key & self.mask) << 1
+        for slot in (slot, slot + 1):
+            data = self.data[slot]
+            if data & USED and self.keys[slot] ^ data == key:
+                self.hits += 1
+                move = data & 0xFFFF
+                return ((data >> 16) & 0xFF, (data >> 24) & 3,
+                        (data >> 32) - SCORE_OFFSET,
+                        None if move == NO_MOVE else move)
+        return None
+
+    def store(self, key, depth, bound, score, move=None):
+        """Record the result of a search of the given depth from key."""
+        self.stores += 1
+        slot = (key & self.mask) << 1
+        data = self.data[slot]
+        if (data & USED and self.keys[slot] ^ data != key and
+                depth < (data >> 16) & 0xFF):
+            # The depth-preferred slot holds a deeper search of another
+            # position, so use the always-replace slot instead
+            slot += 1
+            data = self.data[slot]
+        if data & USED and self.keys[slot] ^ data != key:
+            self.overwrites += 1
+        if move is None:
+            move = NO_MOVE
+        data = (move | min(depth, 0xFF) << 16 | bound << 24 | USED |
+                (score + SCORE_OFFSET) << 32)
+        self.keys[slot] = key ^ data
+        self.data[slot] = data
+
+    def clear(self):
+        """Empty the table and reset the counters."""
+        self.data[:] = array('Q', bytes(8 * len(self.data)))
+        self.keys[:] = array('Q', bytes(8 * len(self.keys)))
+        self.probes = self.hits = self.stores = self.overwrites = 0
+
+    def hit_rate(self):
+        """Return the fraction of probes that found an entry."""
+        return self.hits / self.probes if self.probes else 0.0
+
+    def stats(self):
+        """Return the table counters as a dict."""
+        return {'probes': self.probes, 'hits': self.hits,
+                'hit_rate': self.hit_rate(), 'stores': self.stores,
+                'overwrites': self.overwrites}
+
+    def __len__(self):
+        return sum(1 for data in self.data if data & USED)
+
+    def __repr__(self):
+        return '<%s %d slots>' % (self.__class__.__name__, len(self.data))
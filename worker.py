@@ -0,0 +1,125 @@
+"""Engine searches in the background, for the Tk GUIs and pondering
+
+Tk must only be used from the thread running mainloop, so a GUI starts the
+search with SearchWorker.start and polls done() from an after() callback,
+reading the engine's live counters in between.  Searches check the stop
+Event and give up when it is set, which is how cancel() works.
+
+ProcessWorker has the same interface but runs the call in a forked
+process, for work that should not compete for the GIL with the process
+that started it, such as pondering while the opponent's engine searches.
+
+"""
+
+import multiprocessing
+import threading
+from time import perf_counter
+
+
+class SearchWorker:
+    """Runs one search call in a daemon thread.
+
+    Once done() is true, result holds what the call returned, or error the
+    exception it raised, and seconds how long it ran."""
+
+    def __init__(self):
+        self.stop = threading.Event()
+        self.result = None
+        self.error = None
+        self.seconds = 0.0
+        self._thread = None
+
+    def start(self, function, *args, **kwargs):
+        """Call function(*args, **kwargs) in the background.  Pass it
+        self.stop if it takes one, so that cancel() can end it."""
+        self._thread = threading.Thread(target=self._run,
+                                        args=(function, args, kwargs),
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self, function, args, kwargs):
+        start = perf_counter()
+        try:
+            self.result = function(*args, **kwargs)
+        except Exception as error:
+            self.error = error
+        self.seconds = perf_counter() - start
+
+    def done(self):
+        return self._thread is not None and not self._thread.is_alive()
+
+    def wait(self):
+        """Block until the call has finished."""
+        self._thread.join()
+
+    def cancel(self):
+        """Ask the search to stop; its result should then be ignored."""
+        self.stop.set()
+
+    def __repr__(self):
+        state = 'done' if self.done() else 'running'
+        return '<%s %s>' % (self.__class__.__name__, state)
+
+
+class ProcessWorker(SearchWorker):
+    """A SearchWorker whose call runs in a forked child process.
+
+    The function and its arguments are inherited by the fork rather than
+    pickled, but the result is sent back through a pipe and must pickle.
+    cancel() kills the child.  Where fork is not available the call runs
+    in a thread instead."""
+
+    def __init__(self):
+        SearchWorker.__init__(self)
+        self._process = None
+        self._connection = None
+        self._finished = False
+
+    def start(self, function, *args, **kwargs):
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            return SearchWorker.start(self, function, *args, **kwargs)
+        context = multiprocessing.get_context('fork')
+        self._connection, child = context.Pipe(duplex=False)
+        self._process = context.Process(target=self._child,
+                                        args=(child, function, args, kwargs),
+                                        daemon=True)
+        self._process.start()
+        child.close()
+        return self
+
+    def _child(self, connection, function, args, kwargs):
+        self._run(function, args, kwargs)
+        connection.send((self.result, self.error, self.seconds))
+        connection.close()
+
+    def _collect(self):
+        try:
+            self.result, self.error, self.seconds = self._connection.recv()
+        except EOFError:
+            self.error = ChildProcessError('search process died')
+        self._connection.close()
+        self._process.join()
+        self._finished = True
+
+    def done(self):
+        if self._process is None:
+            return SearchWorker.done(self)
+        if not self._finished and self._connection.poll():
+            self._collect()
+        return self._finished
+
+    def wait(self):
+        if self._process is None:
+            return SearchWorker.wait(self)
+        if not self._finished:
+            self._connection.poll(None)
+            self._collect()
+
+    def cancel(self):
+        SearchWorker.cancel(self)
+        if self._process is not None and not self._finished:
+            self._process.terminate()
+            self._process.join()
+            self._connection.close()
+            self._finished = True